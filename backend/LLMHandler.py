@@ -14,14 +14,23 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from openai import OpenAI
-from google import genai
-from google.genai import types
+import httpx
 import logging as log
-import warnings
 import math
 import json
 import re
+import queue
+import threading
+import hashlib
+import itertools
+import functools
+import time
+import asyncio
+import atexit
+import sys
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from types import MappingProxyType
 
 # Import for prompt creation
 import chess
@@ -29,27 +38,129 @@ import os
 
 # Import rate limiter for Google API
 from google_rate_limiter import GoogleRateLimiter, RateLimitExceeded
+from token_bucket import TokenBucket, TokenBucketExhausted
+from lruCache import LRUCache
+import fastJson
 
 # Default configuration
 DEFAULT_MODEL = os.environ.get("DEFAULT_LLM_MODEL", "llama-3.1-8b-instant")
 DEFAULT_LLM_API_KEY = os.environ.get("DEFAULT_LLM_API_KEY", "unused")
 
+# HTTP connection pool settings shared by the LLM clients
+LLM_HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("LLM_MAX_CONN", "256")),
+    max_keepalive_connections=int(os.environ.get("LLM_MAX_KEEPALIVE", "128")),
+)
+LLM_HTTP_TIMEOUT = httpx.Timeout(connect=10.0, read=120.0, write=30.0, pool=5.0)
+# Retries of the OpenAI SDK on 429/5xx/connection errors, with exponential
+# backoff that honours Retry-After, before failing over to another model
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", "3"))
+
+# Provider SDKs are imported on first use, so a deployment using only one
+# provider never pays the import time (and memory) of the other
+_openai_mod = None
+_genai_mod = None
+_genai_types = None
+
+# Configure logging once at import instead of on every request
+log.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+
+
+def fast_event_loop_factory():
+    """
+    Return the uvloop (winloop on Windows) loop factory when installed, else
+    None. Opt-in: pass it to asyncio.Runner(loop_factory=...) at an async
+    entrypoint driving aquery_LLM and astream_LLM; no global policy is set.
+    """
+    try:
+        if sys.platform == "win32":
+            import winloop as fast_loop
+        else:
+            import uvloop as fast_loop
+    except ImportError:
+        return None
+    return fast_loop.new_event_loop
+
+
+def _openai():
+    global _openai_mod
+    if _openai_mod is None:
+        import openai
+
+        _openai_mod = openai
+    return _openai_mod
+
+
+def _genai():
+    """Return the (genai, types) modules of the Google SDK."""
+    global _genai_mod, _genai_types
+    if _genai_mod is None:
+        from google import genai
+        from google.genai import types
+
+        _genai_types = types
+        _genai_mod = genai
+    return _genai_mod, _genai_types
+
+
 # Initialize Google rate limiter
 google_rate_limiter = GoogleRateLimiter()
 
+# LLM clients are cached so keep-alive connections (and their TLS sessions)
+# are reused across requests instead of being rebuilt on every call
+_OPENAI_CLIENTS = {}  # (base_url, api_key) -> OpenAI
+_ASYNC_OPENAI_CLIENTS = {}  # event loop -> {(base_url, api_key): AsyncOpenAI}
+_GEMINI_CLIENTS = {}  # api_key -> genai.Client
+_client_lock = threading.Lock()
+
+# Answers of the is_chess_related filter, keyed by (question hash, model_name)
+_CHESS_RELATED_CACHE = LRUCache(maxsize=4096)
+
 # Provider-specific configuration
 MODEL_PROVIDERS = {
     "groq": {
         "base_url": "https://api.groq.com/openai/v1",
         "api_key_env": "GROQ_API_KEY",
+        "api_keys_env": "GROQ_API_KEYS",
     },
     # Google models now use native Gemini SDK (not OpenAI compatibility)
     "google": {
         "base_url": None,  # Not used - native SDK
         "api_key_env": "GOOGLE_API_KEY",
+        "api_keys_env": "GOOGLE_API_KEYS",
     },
 }
 
+
+def _load_provider_keys(provider_config):
+    """Collect the single-key env var and the comma-separated key list, deduplicated."""
+    keys = [
+        key.strip()
+        for key in os.environ.get(provider_config["api_keys_env"], "").split(",")
+    ]
+    keys.append(os.environ.get(provider_config["api_key_env"], ""))
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+# Rate limits are per API key, so calls are spread round-robin over all keys
+_API_KEYS = {
+    provider: _load_provider_keys(config)
+    for provider, config in MODEL_PROVIDERS.items()
+}
+_KEY_POOLS = {
+    provider: itertools.cycle(keys) for provider, keys in _API_KEYS.items() if keys
+}
+_key_pool_lock = threading.Lock()
+
+
+def next_api_key(provider):
+    """Return the next API key for the provider, or "unused" if none is configured."""
+    pool = _KEY_POOLS.get(provider)
+    if pool is None:
+        return "unused"
+    with _key_pool_lock:
+        return next(pool)
+
 # Supported models list - You can expand this
 SUPPORTED_MODELS = [
     {
@@ -75,6 +186,25 @@ SUPPORTED_MODELS = [
     {"id": "gemini-3-pro-preview", "name": "Gemini 3 Pro", "provider": "google"},
 ]
 
+_MODEL_INDEX = {m["id"]: m for m in SUPPORTED_MODELS}
+
+# Per-provider limiters checked before every LLM call.
+# Groq free tier allows 30 requests per minute (GROQ_RPM) per key; Google is capped monthly.
+GROQ_RPM = int(os.environ.get("GROQ_RPM", "30")) * max(1, len(_API_KEYS["groq"]))
+PROVIDER_LIMITERS = {
+    "groq": TokenBucket(capacity=GROQ_RPM, refill_rate=GROQ_RPM / 60.0, name="groq"),
+    "google": google_rate_limiter,
+}
+
+# Ordered fallback models (LLM_FAILOVER, comma-separated ids) tried when a call
+# fails with a rate limit, timeout or server error
+LLM_FAILOVER = [
+    m.strip() for m in os.environ.get("LLM_FAILOVER", "").split(",") if m.strip()
+]
+LLM_FAILOVER_BACKOFF = float(os.environ.get("LLM_FAILOVER_BACKOFF", "0.5"))
+PROVIDER_COOLDOWN_SECONDS = 30
+_provider_failed_at = {}  # provider -> time.monotonic() of the last transient failure
+
 # Log warning if API key is not set
 if (
     DEFAULT_LLM_API_KEY == "unused"
@@ -95,6 +225,19 @@ For follow-up questions, refer back to the position and engine analysis provided
 Maintain the same brevity and focus on concrete information when answering follow-ups.
 
 If asked about moves that were not analyzed by the engine, respond that you don't have analysis for those moves and suggest the user try those moves on the board and re-run the analysis to get engine evaluation for them.
+
+You will receive positions in this format:
+Board Layout: the FEN and a summary of the pieces.
+Position Analysis: material, king safety, game phase, castling rights and center control.
+Engine Recommendation: the best move, its win probability for the side to move, the continuation and an assessment.
+
+For such a position, explain why the recommended move is the best move:
+1. Identify the immediate tactical or strategic reason for the move.
+2. Explain how it improves the position of the side to move or prevents a threat.
+3. Mention the long-term plan implied by this move.
+4. Reference the win probability as a quantitative anchor.
+
+Keep the explanation concise (approx. 3-4 sentences) and accessible to an intermediate player.
 """,
     "grandmaster": """
 You are a distinguished grandmaster providing professional chess analysis. Draw from deep strategic understanding and classical chess principles.
@@ -104,6 +247,19 @@ Provide insights that would be valuable to serious competitive players, focusing
 Keep responses focused and concise - avoid lengthy explanations. 3-4 sentences maximum.
 
 For follow-up questions, maintain the same authoritative and educational tone, always grounding responses in sound chess theory while staying brief.
+
+You will receive positions in this format:
+Board Layout: the FEN and a summary of the pieces.
+Position Analysis: material, king safety, game phase, castling rights, center control and the side to move.
+Engine Analysis - Top Candidate Moves: the candidate moves with their win probabilities, assessments and continuations.
+
+For such a position, provide a professional and fluent analysis:
+1. Evaluate the strategic merits of the top recommendation.
+2. Discuss the alternative options and why they might be inferior or different.
+3. Mention the underlying chess principles (tactical and positional) that make these moves strong.
+4. Use the win probabilities to contrast the practical merits between candidate moves.
+
+Maintain a sophisticated, educational tone suitable for a serious player.
 """,
     "evaluator": """
 You are a strict chess supervisor and critic.
@@ -123,8 +279,9 @@ Do not output any markdown or other text.
 """,
 }
 
-# Keep backward compatibility
-SYSTEM_MESSAGE = SYSTEM_MESSAGES["default"]
+# Strip the surrounding newlines once, so every request starts with the same
+# byte-identical system message and providers can reuse its cached prefix
+SYSTEM_MESSAGES = {style: message.strip() for style, message in SYSTEM_MESSAGES.items()}
 
 # Style labels mapping
 STYLE_LABELS = {
@@ -133,16 +290,20 @@ STYLE_LABELS = {
 }
 
 
+# Derived from SYSTEM_MESSAGES once, to maintain consistency
+_ANALYSIS_STYLES = [
+    {"value": style_key, "label": STYLE_LABELS.get(style_key, style_key.title())}
+    for style_key in SYSTEM_MESSAGES.keys()
+    if style_key != "evaluator"
+]
+
+
 def get_analysis_styles():
     """
     Returns the available analysis styles with their labels.
-    Derives from SYSTEM_MESSAGES to maintain consistency.
+    The list is shared between calls and must not be mutated.
     """
-    return [
-        {"value": style_key, "label": STYLE_LABELS.get(style_key, style_key.title())}
-        for style_key in SYSTEM_MESSAGES.keys()
-        if style_key != "evaluator"
-    ]
+    return _ANALYSIS_STYLES
 
 
 def get_available_models():
@@ -158,16 +319,58 @@ def is_gemini_model(model_name):
         model_name: The model ID to check
 
     Returns:
-        bool: True if it's a Gemini model
+        bool: True if it's a Gemini model listed in SUPPORTED_MODELS
     """
-    if not model_name:
+    if model_name is None:
         return False
-    return "gemini" in model_name.lower()
+    return _MODEL_INDEX.get(model_name, {}).get("provider") == "google"
+
+
+def get_model_provider(model_name=None):
+    """
+    Return the provider serving the given model, or None for a custom
+    endpoint configured through DEFAULT_AI_BASE_URL.
+    """
+    if is_gemini_model(model_name):
+        return "google"
+    if os.environ.get("DEFAULT_AI_BASE_URL"):
+        return None
+    model = _MODEL_INDEX.get(model_name or DEFAULT_MODEL)
+    return model["provider"] if model else "groq"
+
+
+def acquire_rate_limit(model_name=None):
+    """
+    Take a slot from the provider's rate limiter before calling the API.
+
+    Raises:
+        RateLimitExceeded: Google monthly quota is exhausted.
+        TokenBucketExhausted: Groq per-minute quota is exhausted.
+    """
+    limiter = PROVIDER_LIMITERS.get(get_model_provider(model_name))
+    if limiter is not None:
+        limiter.acquire_or_raise()
+
+
+async def aacquire_rate_limit(model_name=None):
+    """
+    Async variant of acquire_rate_limit: waiting for a Groq token does not
+    block the event loop.
+
+    Raises:
+        RateLimitExceeded: Google monthly quota is exhausted.
+        TokenBucketExhausted: Groq per-minute quota is exhausted.
+    """
+    limiter = PROVIDER_LIMITERS.get(get_model_provider(model_name))
+    if isinstance(limiter, TokenBucket):
+        await limiter.aacquire_or_raise()
+    elif limiter is not None:
+        limiter.acquire_or_raise()
 
 
 def get_gemini_client(model_name=None):
     """
-    Initialize and return a Gemini client using the native Google SDK.
+    Return a Gemini client using the native Google SDK, cached per API key.
 
     Args:
         model_name: The model ID (not used for client init, but kept for consistency)
@@ -175,13 +378,28 @@ def get_gemini_client(model_name=None):
     Returns:
         genai.Client: Initialized Gemini client
     """
-    api_key = os.environ.get("GOOGLE_API_KEY", "unused")
+    api_key = next_api_key("google")
     if api_key == "unused":
         log.warning("GOOGLE_API_KEY not set for Gemini models")
 
-    # The genai.Client() will automatically use GOOGLE_API_KEY from environment
-    client = genai.Client(api_key=api_key)
-    log.info(f"Initialized Gemini client for model {model_name or 'default'}")
+    client = _GEMINI_CLIENTS.get(api_key)
+    if client is None:
+        with _client_lock:
+            client = _GEMINI_CLIENTS.get(api_key)
+            if client is None:
+                genai, types = _genai()
+                client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(
+                        # Gemini timeouts are expressed in milliseconds
+                        timeout=int(LLM_HTTP_TIMEOUT.read * 1000),
+                        client_args={"limits": LLM_HTTP_LIMITS},
+                    ),
+                )
+                _GEMINI_CLIENTS[api_key] = client
+                log.info(
+                    f"Initialized Gemini client for model {model_name or 'default'}"
+                )
     return client
 
 
@@ -189,6 +407,9 @@ def get_model_config(model_name=None):
     """
     Get the configuration (base_url, api_key) for a specific model.
     Falls back to environment variable DEFAULT_AI_BASE_URL if set (for local models).
+    The HTTP pool used for the resulting client can be tuned with LLM_MAX_CONN
+    and LLM_MAX_KEEPALIVE. When several keys are configured (e.g. GROQ_API_KEYS),
+    each call gets the next key in round-robin order.
 
     Args:
         model_name: The model ID to get config for. If None, uses DEFAULT_MODEL.
@@ -207,11 +428,7 @@ def get_model_config(model_name=None):
         return env_base_url, DEFAULT_LLM_API_KEY
 
     # Find the provider for this model
-    provider = None
-    for model in SUPPORTED_MODELS:
-        if model["id"] == model_name:
-            provider = model["provider"]
-            break
+    provider = _MODEL_INDEX.get(model_name, {}).get("provider")
 
     if provider is None:
         log.warning(
@@ -224,8 +441,8 @@ def get_model_config(model_name=None):
     if provider_config is None:
         raise ValueError(f"Provider {provider} not configured in MODEL_PROVIDERS")
 
-    # Get API key from environment
-    api_key = os.environ.get(provider_config["api_key_env"], "unused")
+    # Get the next API key from the provider's pool
+    api_key = next_api_key(provider)
     if api_key == "unused":
         log.warning(
             f"API key not set for provider {provider} (expected env var: {provider_config['api_key_env']})"
@@ -236,25 +453,90 @@ def get_model_config(model_name=None):
 
 def load_LLM_model(model_name=None):
     """
-    Initialize the OpenAI client with the correct base URL and API key for the specified model.
+    Return the OpenAI client for the specified model, configured with the correct
+    base URL and API key. Clients are cached per (base_url, api_key) so the
+    underlying connection pool is shared between requests.
 
     Args:
         model_name: The model ID to configure for. If None, uses DEFAULT_MODEL.
 
     Returns:
-        tuple: (None, OpenAI client instance)
+        OpenAI: client instance
     """
-    # Removing logging
-    # transformers.utils.logging.disable_progress_bar()
-    warnings.filterwarnings("ignore")
+    base_url, api_key = get_model_config(model_name)
 
+    key = (base_url, api_key)
+    model = _OPENAI_CLIENTS.get(key)
+    if model is None:
+        with _client_lock:
+            model = _OPENAI_CLIENTS.get(key)
+            if model is None:
+                log.info(
+                    f"Initializing LLM client for model {model_name or DEFAULT_MODEL} with base_url: {base_url}"
+                )
+                model = _openai().OpenAI(
+                    base_url=base_url,
+                    api_key=api_key,
+                    max_retries=LLM_MAX_RETRIES,
+                    http_client=httpx.Client(
+                        limits=LLM_HTTP_LIMITS, timeout=LLM_HTTP_TIMEOUT
+                    ),
+                )
+                _OPENAI_CLIENTS[key] = model
+    return model
+
+
+def _close_LLM_clients():
+    """Close the pooled sync clients so keep-alive sockets are released at exit."""
+    with _client_lock:
+        for client in _OPENAI_CLIENTS.values():
+            try:
+                client.close()
+            except Exception as e:
+                log.warning(f"Failed to close LLM client: {e}")
+        _OPENAI_CLIENTS.clear()
+
+
+atexit.register(_close_LLM_clients)
+
+
+def load_async_LLM_model(model_name=None):
+    """
+    Return the AsyncOpenAI client for the specified model, cached like
+    load_LLM_model. httpx async connections belong to the event loop that
+    opened them, so clients are cached per running loop and dropped once the
+    loop is closed.
+    Must be called from a coroutine.
+
+    Args:
+        model_name: The model ID to configure for. If None, uses DEFAULT_MODEL.
+
+    Returns:
+        AsyncOpenAI: client instance
+    """
     base_url, api_key = get_model_config(model_name)
 
-    log.info(
-        f"Initializing LLM client for model {model_name or DEFAULT_MODEL} with base_url: {base_url}"
-    )
-    model = OpenAI(base_url=base_url, api_key=api_key)
-    return None, model
+    key = (base_url, api_key)
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        loop_clients = _ASYNC_OPENAI_CLIENTS.get(loop)
+        if loop_clients is None:
+            # Forget clients of loops that have been closed since
+            for closed in [l for l in _ASYNC_OPENAI_CLIENTS if l.is_closed()]:
+                del _ASYNC_OPENAI_CLIENTS[closed]
+            loop_clients = _ASYNC_OPENAI_CLIENTS[loop] = {}
+        client = loop_clients.get(key)
+        if client is None:
+            client = _openai().AsyncOpenAI(
+                base_url=base_url,
+                api_key=api_key,
+                max_retries=LLM_MAX_RETRIES,
+                http_client=httpx.AsyncClient(
+                    limits=LLM_HTTP_LIMITS, timeout=LLM_HTTP_TIMEOUT
+                ),
+            )
+            loop_clients[key] = client
+    return client
 
 
 def __format_eval(entry):
@@ -266,6 +548,23 @@ def __format_eval(entry):
     return None
 
 
+# Win-probability sigmoid: P(win) = 1 / (1 + e^(-k * score)), k = 0.00368
+WINPROB_K = 0.00368
+_SCORE_TABLE_RANGE = 1000
+
+
+def _sigmoid_winprob(score):
+    # Same curve as 100 / (1 + e^(-k * score)), but tanh cannot overflow
+    return int(50 * (1 + math.tanh(WINPROB_K / 2 * score)))
+
+
+# Precomputed win probabilities for integer scores in [-1000, 1000] cp
+_SCORE_TO_WINPROB = tuple(
+    _sigmoid_winprob(cp)
+    for cp in range(-_SCORE_TABLE_RANGE, _SCORE_TABLE_RANGE + 1)
+)
+
+
 def calculate_win_probability(score=None, mate=None, engine_winprob=None):
     """
     Calculates the win probability (0-100) from engine evaluation.
@@ -278,63 +577,201 @@ def calculate_win_probability(score=None, mate=None, engine_winprob=None):
         return 100 if mate > 0 else 0
     
     if score is not None:
-        # Convert Centipawns to Win Probability (Sigmoid curve approximation)
-        # P(win) = 1 / (1 + e^(-k * score))
-        # k = 0.00368
-        try:
-            val = 100 / (1 + math.exp(-0.00368 * score))
-            return int(val)
-        except OverflowError:
-            return 100 if score > 0 else 0
+        # Convert Centipawns to Win Probability (Sigmoid curve approximation),
+        # using the lookup table for the common range
+        if isinstance(score, int) and -_SCORE_TABLE_RANGE <= score <= _SCORE_TABLE_RANGE:
+            return _SCORE_TO_WINPROB[score + _SCORE_TABLE_RANGE]
+        return _sigmoid_winprob(score)
             
     return 50  # Default to equal if no info
 
 
+def _winprob_template(i):
+    """Evaluation sentence for a win probability, with a {side} placeholder"""
+    if 0 <= i <= 5:
+        return "{side} has a decisive disadvantage, with the position clearly leading to a loss."
+    elif 6 <= i <= 10:
+        return "{side} has decisive disadvantage: the opponent has a dominant position and is likely winning."
+    elif 11 <= i <= 15:
+        return "{side} has clear disadvantage: a substantial positional disadvantage, but a win is not yet inevitable."
+    elif 16 <= i <= 20:
+        return "{side} has a significant disadvantage: difficult to recover."
+    elif 21 <= i <= 24:
+        return "{side} has a slight disadvantage with a positional edge, but no immediate threats."
+    elif 25 <= i <= 49:
+        return "{side} is in a defensive position. The opponent has an initiative."
+    elif i == 50:
+        return "The position is equal. Both sides are evenly matched, with no evident advantage."
+    elif 51 <= i <= 75:
+        return "{side} has initiative: by applying pressure and it can achieve an edge with active moves and forcing ideas."
+    elif 76 <= i <= 79:
+        return "{side} has a slight advantage: a minor positional edge, but it’s not decisive."
+    elif 80 <= i <= 84:
+        return "{side} is slightly better, tending toward a clear advantage. The advantage is growing, but the position is still not decisive."
+    elif 85 <= i <= 89:
+        return "{side} has a clear advantage: a significant edge, but still with defensive chances."
+    elif 90 <= i <= 94:
+        return "{side} has a dominant position, almost decisive, not quite winning yet, but trending toward victory."
+    elif 95 <= i <= 100:
+        return "{side} has a decisive advantage, with victory nearly assured."
+    else:
+        return "Total chaos: unclear position, dynamically balanced."
+
+
+# One template per integer win probability in [0, 100]
+_WINPROB_TEMPLATES = tuple(_winprob_template(i) for i in range(101))
+_UNCLEAR_TEMPLATE = _winprob_template(-1)
+# The same sentences already filled in for both sides
+_WINPROB_TEXTS = {
+    side: tuple(template.format(side=side) for template in _WINPROB_TEMPLATES)
+    for side in ("White", "Black")
+}
+
+
 def __mapWinProb(winprob, side, score=None, mate=None):
     # Use unified calculation
     winprob = calculate_win_probability(score=score, mate=mate, engine_winprob=winprob)
 
-    if 0 <= winprob <= 5:
-        return f"{side} has a decisive disadvantage, with the position clearly leading to a loss."
-    elif 6 <= winprob <= 10:
-        return f"{side} has decisive disadvantage: the opponent has a dominant position and is likely winning."
-    elif 11 <= winprob <= 15:
-        return f"{side} has clear disadvantage: a substantial positional disadvantage, but a win is not yet inevitable."
-    elif 16 <= winprob <= 20:
-        return f"{side} has a significant disadvantage: difficult to recover."
-    elif 21 <= winprob <= 24:
-        return f"{side} has a slight disadvantage with a positional edge, but no immediate threats."
-    elif 25 <= winprob <= 49:
-        return f"{side} is in a defensive position. The opponent has an initiative."
-    elif winprob == 50:
-        return "The position is equal. Both sides are evenly matched, with no evident advantage."
-    elif 51 <= winprob <= 75:
-        return f"{side} has initiative: by applying pressure and it can achieve an edge with active moves and forcing ideas."
-    elif 76 <= winprob <= 79:
-        return f"{side} has a slight advantage: a minor positional edge, but it’s not decisive."
-    elif 80 <= winprob <= 84:
-        return f"{side} is slightly better, tending toward a clear advantage. The advantage is growing, but the position is still not decisive."
-    elif 85 <= winprob <= 89:
-        return f"{side} has a clear advantage: a significant edge, but still with defensive chances."
-    elif 90 <= winprob <= 94:
-        return f"{side} has a dominant position, almost decisive, not quite winning yet, but trending toward victory."
-    elif 95 <= winprob <= 100:
-        return f"{side} has a decisive advantage, with victory nearly assured."
+    if 0 <= winprob <= 100:
+        texts = _WINPROB_TEXTS.get(side)
+        if texts is not None:
+            return texts[winprob]
+        return _WINPROB_TEMPLATES[winprob].format(side=side)
+    return _UNCLEAR_TEMPLATE
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_uci(move):
+    return chess.Move.from_uci(move)
+
+
+# SAN of a move keyed by (position, move): SAN only depends on the position,
+# and PVs of different depths or lines keep reaching the same ones
+_SAN_CACHE = LRUCache(maxsize=32768)
+
+
+def _fast_san_and_push(board, move):
+    """
+    board.san_and_push for the common case where the move needs no
+    disambiguation, decided with a bitboard test instead of enumerating
+    legal moves. Castling and ambiguous moves fall back to board.san_and_push.
+    """
+    piece_type = board.piece_type_at(move.from_square)
+    if piece_type is None or board.is_castling(move):
+        return board.san_and_push(move)
+
+    to_square = move.to_square
+    capture = board.is_capture(move)
+    if piece_type == chess.PAWN:
+        san = chess.FILE_NAMES[chess.square_file(move.from_square)] + "x" if capture else ""
     else:
-        return "Total chaos: unclear position, dynamically balanced."
+        # Other pieces of the same kind that attack the target square (a
+        # superset of the legal alternatives) would require disambiguation
+        if (
+            board.attackers_mask(board.turn, to_square)
+            & board.pieces_mask(piece_type, board.turn)
+            & ~chess.BB_SQUARES[move.from_square]
+        ):
+            return board.san_and_push(move)
+        san = chess.piece_symbol(piece_type).upper() + ("x" if capture else "")
+    san += chess.SQUARE_NAMES[to_square]
+    if move.promotion:
+        san += "=" + chess.piece_symbol(move.promotion).upper()
+
+    board.push(move)
+    if board.is_check():
+        san += "#" if board.is_checkmate() else "+"
+    return san
 
 
-def generate_line(line, board):
-    tmp_board = board.copy()
+def _san_and_push(board, move):
+    key = (board._transposition_key(), move)
+    san = _SAN_CACHE.get(key)
+    if san is None:
+        # The push is reused for the check suffix
+        san = _fast_san_and_push(board, move)
+        _SAN_CACHE.put(key, san)
+    else:
+        board.push(move)
+    return san
+
+
+def _pv_san(line, board, skip=0):
+    """
+    Convert a PV (list of UCI strings) to SAN, walking the board with
+    push/pop so it is left unchanged without being copied. The first skip
+    moves are played without computing their SAN.
+    """
     san_line = []
-    for idx, move in enumerate(line):
-        uci_move = chess.Move.from_uci(move)
-        san_move = tmp_board.san(uci_move)
-        if idx > 0:
-            # Skip the first move
-            san_line.append(san_move)
-        tmp_board.push(uci_move)
-    return " ".join(san_line)
+    pushed = 0
+    try:
+        for move in line:
+            move = _parse_uci(move)
+            if pushed < skip:
+                board.push(move)
+            else:
+                san_line.append(_san_and_push(board, move))
+            pushed += 1
+    finally:
+        for _ in range(pushed):
+            board.pop()
+    return san_line
+
+
+# SAN lines keyed by (fen, PV as a tuple of UCI moves), shared between
+# create_prompt_single_engine and analysis_to_string, which both convert the
+# first _PV_SAN_PLIES moves of each PV
+_PV_SAN_PLIES = 5
+_SAN_LINE_CACHE = LRUCache(maxsize=4096)
+
+
+def _pv_san_lines(fen, lines, board):
+    """
+    Convert several PVs from the position fen to SAN, memoized (the results
+    must not be mutated). The uncached ones are converted in a single walk:
+    they are visited in sorted order and the board only backs up to the
+    prefix shared with the previous PV, so common moves are pushed and
+    converted once.
+    """
+    san_lines = [None] * len(lines)
+    pending = []
+    for i, line in enumerate(lines):
+        line = tuple(line)
+        san_line = _SAN_LINE_CACHE.get((fen, line))
+        if san_line is None:
+            pending.append((line, i))
+        else:
+            san_lines[i] = san_line
+
+    path = []
+    path_san = []
+    try:
+        for line, i in sorted(pending):
+            common = 0
+            for pushed, move in zip(path, line):
+                if pushed != move:
+                    break
+                common += 1
+            while len(path) > common:
+                board.pop()
+                path.pop()
+                path_san.pop()
+            for move in line[common:]:
+                path_san.append(_san_and_push(board, _parse_uci(move)))
+                path.append(move)
+            san_line = path_san[:]
+            _SAN_LINE_CACHE.put((fen, line), san_line)
+            san_lines[i] = san_line
+    finally:
+        for _ in path:
+            board.pop()
+    return san_lines
+
+
+def generate_line(line, board):
+    # Skip the first move
+    return " ".join(_pv_san(line, board, skip=1))
+
 
 def get_concise_fen_summary(fen, board):
     """Generate a concise summary of the board layout without listing every square"""
@@ -351,17 +788,18 @@ def get_concise_fen_summary(fen, board):
     white_pieces = []
     black_pieces = []
 
-    for square, piece in board.piece_map().items():
-        square_name = chess.square_name(square)
-        piece_symbol = piece.symbol().upper()
-
-        # Include non-pawn pieces and any pawn that has moved from starting rank
-        rank = chess.square_rank(square)
-        if piece.piece_type != chess.PAWN or (piece.color == chess.WHITE and rank != 1) or (piece.color == chess.BLACK and rank != 6):
-            if piece.color == chess.WHITE:
-                white_pieces.append(f"{piece_symbol}{square_name}")
-            else:
-                black_pieces.append(f"{piece_symbol}{square_name}")
+    # Include non-pawn pieces and any pawn that has moved from starting rank
+    white = board.occupied_co[chess.WHITE]
+    unmoved_pawns = board.pawns & (
+        (white & chess.BB_RANK_2) | (board.occupied_co[chess.BLACK] & chess.BB_RANK_7)
+    )
+    # Same square order as board.piece_map()
+    for square in chess.scan_reversed(board.occupied & ~unmoved_pawns):
+        entry = f"{chess.piece_symbol(board.piece_type_at(square)).upper()}{chess.SQUARE_NAMES[square]}"
+        if white & chess.BB_SQUARES[square]:
+            white_pieces.append(entry)
+        else:
+            black_pieces.append(entry)
 
     if white_pieces:
         summary_parts.append(f"White pieces (active): {', '.join(white_pieces)}")
@@ -370,32 +808,40 @@ def get_concise_fen_summary(fen, board):
 
     return "; ".join(summary_parts)
 
-def analyze_position_context(fen, board):
+def _material(board, color):
+    """Material of one side (P=1, N=B=3, R=5, Q=9) from bitboard popcounts."""
+    occ = board.occupied_co[color]
+    return (
+        (board.pawns & occ).bit_count()
+        + 3 * ((board.knights | board.bishops) & occ).bit_count()
+        + 5 * (board.rooks & occ).bit_count()
+        + 9 * (board.queens & occ).bit_count()
+    )
+
+
+CENTER_MASK = chess.BB_E4 | chess.BB_D4 | chess.BB_E5 | chess.BB_D5
+
+# King squares reported as castled/safe (back two ranks, off the d and e
+# files) or exposed (fourth rank or beyond from the own side), per side
+_KING_WINGS = ~(chess.BB_FILE_D | chess.BB_FILE_E) & chess.BB_ALL
+_WHITE_KING_SAFE = (chess.BB_RANK_1 | chess.BB_RANK_2) & _KING_WINGS
+_WHITE_KING_EXPOSED = ~(chess.BB_RANK_1 | chess.BB_RANK_2 | chess.BB_RANK_3) & chess.BB_ALL
+_BLACK_KING_SAFE = (chess.BB_RANK_7 | chess.BB_RANK_8) & _KING_WINGS
+_BLACK_KING_EXPOSED = ~(chess.BB_RANK_6 | chess.BB_RANK_7 | chess.BB_RANK_8) & chess.BB_ALL
+
+# Game phase by number of pieces on the board (more than these counts)
+_OPENING_MIN_PIECES = 24
+_MIDDLEGAME_MIN_PIECES = 12
+
+
+def analyze_position_context(board):
     """Generate additional context about the position for the LLM"""
     context = []
 
-    # Material count
-    material = {
-        chess.PAWN: 1,
-        chess.KNIGHT: 3,
-        chess.BISHOP: 3,
-        chess.ROOK: 5,
-        chess.QUEEN: 9,
-        chess.KING: 0,
-    }
-
-    white_material = sum(
-        material[piece.piece_type]
-        for piece in board.piece_map().values()
-        if piece.color == chess.WHITE
-    )
-    black_material = sum(
-        material[piece.piece_type]
-        for piece in board.piece_map().values()
-        if piece.color == chess.BLACK
-    )
+    white = board.occupied_co[chess.WHITE]
+    black = board.occupied_co[chess.BLACK]
 
-    material_diff = white_material - black_material
+    material_diff = _material(board, chess.WHITE) - _material(board, chess.BLACK)
     if material_diff > 0:
         context.append(f"Material: White is ahead by {material_diff} points")
     elif material_diff < 0:
@@ -407,20 +853,18 @@ def analyze_position_context(fen, board):
     white_king_square = board.king(chess.WHITE)
     black_king_square = board.king(chess.BLACK)
 
-    if white_king_square:
-        white_king_file = chess.square_file(white_king_square)
-        white_king_rank = chess.square_rank(white_king_square)
-        if white_king_rank <= 1 and (white_king_file <= 2 or white_king_file >= 5):
+    if white_king_square is not None:
+        white_king_bb = chess.BB_SQUARES[white_king_square]
+        if white_king_bb & _WHITE_KING_SAFE:
             context.append("White king appears castled/safe")
-        elif white_king_rank >= 3:
+        elif white_king_bb & _WHITE_KING_EXPOSED:
             context.append("White king is exposed in the center")
 
-    if black_king_square:
-        black_king_file = chess.square_file(black_king_square)
-        black_king_rank = chess.square_rank(black_king_square)
-        if black_king_rank >= 6 and (black_king_file <= 2 or black_king_file >= 5):
+    if black_king_square is not None:
+        black_king_bb = chess.BB_SQUARES[black_king_square]
+        if black_king_bb & _BLACK_KING_SAFE:
             context.append("Black king appears castled/safe")
-        elif black_king_rank <= 4:
+        elif black_king_bb & _BLACK_KING_EXPOSED:
             context.append("Black king is exposed in the center")
 
     # Check status
@@ -430,10 +874,10 @@ def analyze_position_context(fen, board):
         )
 
     # Game phase indicator
-    total_pieces = len(board.piece_map())
-    if total_pieces > 24:
+    total_pieces = board.occupied.bit_count()
+    if total_pieces > _OPENING_MIN_PIECES:
         context.append("Position: Opening/Early middlegame")
-    elif total_pieces > 12:
+    elif total_pieces > _MIDDLEGAME_MIN_PIECES:
         context.append("Position: Middlegame")
     else:
         context.append("Position: Endgame")
@@ -456,17 +900,8 @@ def analyze_position_context(fen, board):
         context.append(f"Black castling rights: {'/'.join(b_rights)}")
 
     # Center Occupation
-    center_sqs = [chess.E4, chess.D4, chess.E5, chess.D5]
-    w_center = sum(
-        1
-        for sq in center_sqs
-        if board.piece_at(sq) and board.piece_at(sq).color == chess.WHITE
-    )
-    b_center = sum(
-        1
-        for sq in center_sqs
-        if board.piece_at(sq) and board.piece_at(sq).color == chess.BLACK
-    )
+    w_center = (white & CENTER_MASK).bit_count()
+    b_center = (black & CENTER_MASK).bit_count()
     if w_center > b_center:
         context.append("White occupies more center squares")
     elif b_center > w_center:
@@ -475,19 +910,25 @@ def analyze_position_context(fen, board):
     return "; ".join(context)
 
 
-def analysis_to_string(fen, side, analysis):
+def analysis_to_string(fen, side, analysis, board=None):
+    if not analysis:
+        return ""
+
     output = []
-    board = chess.Board(fen)
+    if board is None:
+        board = chess.Board(fen)
 
     # Show top 3 moves with their evaluations
-    for idx, item in enumerate(analysis[:3]):
+    top = analysis[:3]
+    san_lines = _pv_san_lines(
+        fen, [item["pv_moves"][:_PV_SAN_PLIES] for item in top], board
+    )
+    for idx, (item, san_line) in enumerate(zip(top, san_lines)):
         eval_text = __mapWinProb(item["winprob"], side)
-        line_moves = generate_line(item["pv_moves"][:5], board)
+        line_moves = " ".join(san_line[1:])
 
         # Add move explanation
-        first_move = item["pv_moves"][0] if item["pv_moves"] else "No move"
-        move_obj = chess.Move.from_uci(first_move)
-        move_san = board.san(move_obj)
+        move_san = san_line[0] if san_line else "No move"
 
         output.append(f"Option {idx+1}: {move_san} - {eval_text}")
         if line_moves:
@@ -496,53 +937,116 @@ def analysis_to_string(fen, side, analysis):
     return "\n".join(output)
 
 
-def create_prompt_single_engine(fen, bestmoves, ponder, style="default"):
-    log.basicConfig(level=log.INFO)
-    board = chess.Board(fen)
-    side = "White" if board.turn == chess.WHITE else "Black"
-    
-    # Generate concise summary for use in all prompts
-    fen_summary = get_concise_fen_summary(fen, board)
+# Prompts for finished games, keyed by (termination, style). Styles without
+# their own entry use the "default" one.
+_GAME_OVER_PROMPTS = {
+    (chess.Termination.CHECKMATE, "default"): "{fen_summary}\n\nThe game is over. {winner} has won by checkmate. Explain the final position and the checkmate pattern.",
+    (chess.Termination.CHECKMATE, "grandmaster"): "The game has concluded with {winner} delivering checkmate. {fen_summary}\n\nAs a Grandmaster, analyze the final mating pattern and the decisive elements of the position.",
+    (chess.Termination.STALEMATE, "default"): "{fen_summary}\n\nThe game is drawn by stalemate. Explain why the king has no legal moves but is not in check.",
+    (chess.Termination.STALEMATE, "grandmaster"): "The game has ended in a stalemate. {fen_summary}\n\nAs a Grandmaster, comment on this draw resource.",
+    (chess.Termination.INSUFFICIENT_MATERIAL, "default"): "{fen_summary}\n\nThe game is drawn due to insufficient material.",
+}
+# Catch-all for other endings (75-move rule, fivefold repetition)
+_GAME_OVER_FALLBACK_PROMPT = "{fen_summary}\n\nThe game has ended. Result: {result}. Explain the situation."
 
-    # NEW: Check for game over conditions before checking engine analysis
-    if board.is_checkmate():
-        winner = "Black" if board.turn == chess.WHITE else "White"
-        prompt = f"{fen_summary}\n\nThe game is over. {winner} has won by checkmate. Explain the final position and the checkmate pattern."
-        if style == "grandmaster":
-            prompt = f"The game has concluded with {winner} delivering checkmate. {fen_summary}\n\nAs a Grandmaster, analyze the final mating pattern and the decisive elements of the position."
-        return prompt
 
-    if board.is_stalemate():
-        prompt = f"{fen_summary}\n\nThe game is drawn by stalemate. Explain why the king has no legal moves but is not in check."
-        if style == "grandmaster":
-            prompt = f"The game has ended in a stalemate. {fen_summary}\n\nAs a Grandmaster, comment on this draw resource."
-        return prompt
+# Prompts keyed by (fen, style, engine lines as used in the prompt), so
+# repeated analyses of a position skip board parsing and SAN generation
+_PROMPT_CACHE = LRUCache(maxsize=2048)
 
-    if board.is_insufficient_material():
-        prompt = f"{fen_summary}\n\nThe game is drawn due to insufficient material."
-        return prompt
 
-    if board.is_game_over():  # Catch-all for other draws (repetition, 50-move)
-        result = board.result()
-        prompt = f"{fen_summary}\n\nThe game has ended. Result: {result}. Explain the situation."
+def _prompt_cache_key(fen, bestmoves, style):
+    return (
+        fen,
+        style,
+        tuple(
+            (
+                tuple(move_data["pv_moves"][:_PV_SAN_PLIES]),
+                move_data.get("winprob"),
+                move_data.get("score"),
+                move_data.get("mate"),
+            )
+            if move_data and move_data.get("pv_moves")
+            else None
+            for move_data in bestmoves[:3]
+        ),
+    )
+
+
+def create_prompt_single_engine(fen, bestmoves, ponder, style="default", board=None):
+    """
+    Build the analysis prompt for a position. A caller that already parsed
+    the FEN can pass its board, which is used (and left unchanged) instead
+    of parsing it again.
+    """
+    cache_key = _prompt_cache_key(fen, bestmoves, style)
+    prompt = _PROMPT_CACHE.get(cache_key)
+    if prompt is not None:
+        log.debug("Reusing cached %s prompt for %s", style, fen)
         return prompt
 
+    if board is None:
+        board = chess.Board(fen)
+    prompt = _build_prompt_single_engine(fen, bestmoves, style, board)
+    _PROMPT_CACHE.put(cache_key, prompt)
+    return prompt
+
+
+def _build_prompt_single_engine(fen, bestmoves, style, board):
+    side = "White" if board.turn == chess.WHITE else "Black"
+    
+    # Generate concise summary for use in all prompts
+    fen_summary = get_concise_fen_summary(fen, board)
+
+    # NEW: Check for game over conditions before checking engine analysis.
+    # board.outcome() runs the move generation once for all terminations.
+    outcome = board.outcome()
+    if outcome is not None:
+        termination = outcome.termination
+        # outcome() reports insufficient material before stalemate; a
+        # stalemate has always taken priority here
+        if (
+            termination == chess.Termination.INSUFFICIENT_MATERIAL
+            and board.is_stalemate()
+        ):
+            termination = chess.Termination.STALEMATE
+        template = _GAME_OVER_PROMPTS.get(
+            (termination, style)
+        ) or _GAME_OVER_PROMPTS.get(
+            (termination, "default"), _GAME_OVER_FALLBACK_PROMPT
+        )
+        return template.format(
+            fen_summary=fen_summary,
+            winner="White" if outcome.winner == chess.WHITE else "Black",
+            result=outcome.result(),
+        )
+
     # Get position context
-    position_context = analyze_position_context(fen, board)
+    position_context = analyze_position_context(board)
 
     # Generate analysis for top 3 moves
+    top = [
+        (idx, move_data)
+        for idx, move_data in enumerate(bestmoves[:3])
+        if move_data and move_data.get("pv_moves")
+    ]
+    # First moves and continuations come from one walk over all PVs, shared
+    # with analysis_to_string; the prompt shows three more plies
+    san_lines = _pv_san_lines(
+        fen,
+        [move_data["pv_moves"][:_PV_SAN_PLIES] for _, move_data in top],
+        board,
+    )
     moves_analysis = []
-    for idx, move_data in enumerate(bestmoves[:3]):
-        if not move_data or not move_data.get("pv_moves"):
-            continue
-
+    for (idx, move_data), san_line in zip(top, san_lines):
         move_uci = move_data["pv_moves"][0]
-        move_san = board.san(chess.Move.from_uci(move_uci))
+        san_line = san_line[:4]
+        move_san = san_line[0]
         
         winprob_numeric = move_data.get("winprob")
         win_prob_text = __mapWinProb(winprob_numeric, side, move_data.get("score"), move_data.get("mate"))
         
-        continuation = generate_line(move_data["pv_moves"][:4], board)
+        continuation = " ".join(san_line[1:])
 
         moves_analysis.append(
             {
@@ -565,39 +1069,65 @@ def create_prompt_single_engine(fen, bestmoves, ponder, style="default"):
             fen_summary, side, position_context, moves_analysis
         )
 
-    log.info(f"Generated {style} prompt for single engine:")
-    log.info(prompt)
+    log.debug("Generated %s prompt for single engine:\n%s", style, prompt)
     return prompt
 
 
-def create_default_prompt(fen_summary, side, position_context, moves_analysis):
-    if not moves_analysis:
-        return f"{fen_summary}\n\nThe engine failed to analyze this position. Please ask me to analyze it again or check the logs."
+def create_prompt_single_engine_batch(items, style="default"):
+    """
+    Build single-engine prompts for many positions (e.g. every ply of a game).
+
+    Args:
+        items: Iterable of (fen, bestmoves, ponder) tuples.
+        style: Analysis style shared by all prompts.
+
+    Returns:
+        list: One prompt per item, in order.
+    """
+    return [
+        create_prompt_single_engine(fen, bestmoves, ponder, style)
+        for fen, bestmoves, ponder in items
+    ]
 
-    best_move = moves_analysis[0]
 
-    prompt = f"""Board Layout:
+# The task instructions live in SYSTEM_MESSAGES, so every request shares the
+# same static prefix (cacheable by the providers) and the user prompt only
+# carries the position-specific data.
+_DEFAULT_TEMPLATE = """Board Layout:
 {fen_summary}
 
 Position Analysis:
 {position_context}
 
 Engine Recommendation:
-Best Move: {best_move['move_san']}
-Win Probability: {best_move['winprob_numeric']}% for {side}
-Continuation: {best_move['continuation']}
-Assessment: {best_move['evaluation']}
+Best Move: {move_san}
+Win Probability: {winprob_numeric}% for {side}
+Continuation: {continuation}
+Assessment: {evaluation}"""
 
-Task:
-Explain why {best_move['move_san']} is the best move.
-1. Identify the immediate tactical or strategic reason for the move.
-2. Explain how it improves {side}'s position or prevents a threat.
-3. Mention the long-term plan implied by this move.
-4. Reference the win probability as a quantitative anchor.
+_GRANDMASTER_TEMPLATE = """Board Layout:
+{fen_summary}
 
-Keep the explanation concise (approx. 3-4 sentences) and accessible to an intermediate player."""
+Position Analysis:
+{position_context}
+Side to move: {side}
 
-    return prompt
+Engine Analysis - Top Candidate Moves:
+{moves_text}"""
+
+_GRANDMASTER_MOVE_TEMPLATE = "{rank}. {move_san} ({winprob_numeric}% win probability) - {evaluation}\n   Continuation: {continuation}"
+
+
+def create_default_prompt(fen_summary, side, position_context, moves_analysis):
+    if not moves_analysis:
+        return f"{fen_summary}\n\nThe engine failed to analyze this position. Please ask me to analyze it again or check the logs."
+
+    return _DEFAULT_TEMPLATE.format(
+        fen_summary=fen_summary,
+        position_context=position_context,
+        side=side,
+        **moves_analysis[0],
+    )
 
 
 def create_grandmaster_prompt(fen_summary, side, position_context, moves_analysis):
@@ -605,36 +1135,34 @@ def create_grandmaster_prompt(fen_summary, side, position_context, moves_analysi
         return "The engine could not analyze this position. As a Grandmaster, I cannot comment on specific lines without calculation."
 
     moves_text = "\n".join(
-        [
-            f"{move['rank']}. {move['move_san']} ({move['winprob_numeric']}% win probability) - {move['evaluation']}\n   Continuation: {move['continuation']}"
-            for move in moves_analysis
-        ]
+        _GRANDMASTER_MOVE_TEMPLATE.format_map(move) for move in moves_analysis
     )
 
-    prompt = f"""Board Layout:
-{fen_summary}
-
-Position Analysis:
-{position_context}
-Side to move: {side}
+    return _GRANDMASTER_TEMPLATE.format(
+        fen_summary=fen_summary,
+        position_context=position_context,
+        side=side,
+        moves_text=moves_text,
+    )
 
-Engine Analysis - Top Candidate Moves:
-{moves_text}
 
-Task:
-As a Grandmaster, provide a professional and fluent analysis of this position.
-1. Evaluate the strategic merits of the top recommendation.
-2. Discuss the alternative options and why they might be inferior or different.
-3. Mention the underlying chess principles (tactical and positional) that make these moves strong.
-4. Use the win probabilities to contrast the practical merits between candidate moves.
+_DOUBLE_ENGINE_TEMPLATE = """I will explain the board situation:
+{fen_summary}
 
-Maintain a sophisticated, educational tone suitable for a serious player."""
+I have two engines: one with NNUE, called ShashChess, and another that simulates human thought, called Alexander.
+ShashChess suggests the best move **{nnue_best}** (in UCI format){nnue_eval_clause},
+while Alexander suggests the best move is **{human_best}** (in UCI format){human_eval_clause}.
+ShashChess evaluates Alexander's top move with a score of {eval_human_move} and Alexander evaluates ShashChess' best move with a score of {eval_nnue_move}.
+If the engines disagree on the best move, note that ShashChess also suggests these other strong moves: {nnue_alternatives},
+while Alexander suggests these: {human_alternatives}.
+If either engine considers the other's top choice among these alternatives, that might imply partial agreement."""
 
-    return prompt
+_DOUBLE_ENGINE_QUESTION = "Can you explain why these suggested moves are strong? Provide an insightful chess analysis."
 
 
-def create_prompt_double_engine(fen, engine_analysis):
-    board = chess.Board(fen)
+def create_prompt_double_engine(fen, engine_analysis, board=None):
+    if board is None:
+        board = chess.Board(fen)
     fen_summary = get_concise_fen_summary(fen, board)
 
     nnue = engine_analysis["NNUE"]
@@ -646,40 +1174,73 @@ def create_prompt_double_engine(fen, engine_analysis):
     nnue_best_eval = __format_eval(nnue["top_moves"][0])
     human_best_eval = __format_eval(human["top_moves"][0])
 
-    bestmove_prompt = f"""I have two engines: one with NNUE, called ShashChess, and another that simulates human thought, called Alexander.
-        ShashChess suggests the best move **{nnue_best}** (in UCI format) {f"with an evaluation of {nnue_best_eval}" if nnue_best_eval is not None else "" },
-        while Alexander suggests the best move is **{human_best}** (in UCI format) {f"with an evaluation of {human_best_eval}" if human_best_eval is not None else "" }.
-        ShashChess evaluates Alexander's top move with a score of {nnue['eval_human_move']} and Alexander evaluates ShashChess' best move with a score of {human['eval_nnue_move']}.
-        If the engines disagree on the best move, note that ShashChess also suggests these other strong moves: {nnue['top_moves'][1:]},
-        while Alexander suggests these: {human['top_moves'][1:]}.
-        If either engine considers the other's top choice among these alternatives, that might imply partial agreement."""
-
-    counter_prompt = f"""{"ShashChess expects a reply to his best move of **" + engine_analysis['NNUE'].get('ponder', '') + "**." if engine_analysis['NNUE'].get('ponder') else ""}
-        {"Alexander expects a reply to his best move of **" + engine_analysis['HUMAN'].get('ponder', '') + "**." if engine_analysis['HUMAN'].get('ponder') else ""}
-        {"ShashChess also evaluates Alexander's expected reply with a score of " + str(nnue['eval_human_ponder']) + "." if nnue['eval_human_ponder'] is not None else ""}
-        {"Alexander also evaluates ShashChess's expected reply with a score of " + str(human['eval_nnue_ponder']) + "." if human['eval_nnue_ponder'] is not None else ""}"""
-
-    full_prompt = (
-        "I will explain the board situation:\n"
-        + fen_summary
-        + "\n\n"
-        + bestmove_prompt
-        + " "
-        + counter_prompt
-        + "Can you explain why these suggested moves are strong? Provide an insightful chess analysis."
-    )
-    return full_prompt
+    # The optional fragments are only added when there is data, so no blank
+    # lines reach the LLM
+    parts = [
+        _DOUBLE_ENGINE_TEMPLATE.format(
+            fen_summary=fen_summary,
+            nnue_best=nnue_best,
+            nnue_eval_clause=(
+                "" if nnue_best_eval is None
+                else f" with an evaluation of {nnue_best_eval}"
+            ),
+            human_best=human_best,
+            human_eval_clause=(
+                "" if human_best_eval is None
+                else f" with an evaluation of {human_best_eval}"
+            ),
+            eval_human_move=nnue["eval_human_move"],
+            eval_nnue_move=human["eval_nnue_move"],
+            nnue_alternatives=nnue["top_moves"][1:],
+            human_alternatives=human["top_moves"][1:],
+        )
+    ]
+
+    if nnue.get("ponder"):
+        parts.append(
+            f"ShashChess expects a reply to his best move of **{nnue['ponder']}**."
+        )
+    if human.get("ponder"):
+        parts.append(
+            f"Alexander expects a reply to his best move of **{human['ponder']}**."
+        )
+    if nnue["eval_human_ponder"] is not None:
+        parts.append(
+            f"ShashChess also evaluates Alexander's expected reply with a score of {nnue['eval_human_ponder']}."
+        )
+    if human["eval_nnue_ponder"] is not None:
+        parts.append(
+            f"Alexander also evaluates ShashChess's expected reply with a score of {human['eval_nnue_ponder']}."
+        )
+
+    parts.append(_DOUBLE_ENGINE_QUESTION)
+    return "\n".join(parts)
 
 
+@functools.lru_cache(maxsize=32)
 def _get_request_kwargs(model_name):
     """
     Prepare extra arguments for specific models (e.g. Gemini Thinking).
+    Cached per model; the returned mapping is read-only.
     """
-    kwargs = {
-        "model": model_name if model_name else DEFAULT_MODEL,
-    }
+    return MappingProxyType(
+        {
+            "model": model_name if model_name else DEFAULT_MODEL,
+        }
+    )
+
 
-    return kwargs
+@functools.lru_cache(maxsize=32)
+def _get_stream_kwargs(model_name):
+    """_get_request_kwargs plus the streaming parameters."""
+    return MappingProxyType(
+        {
+            **_get_request_kwargs(model_name),
+            "stream": True,
+            # Higher limit for thinking models
+            "max_completion_tokens": 4096 * 8,
+        }
+    )
 
 
 def _sanitize_history(chat_history):
@@ -694,79 +1255,236 @@ def _sanitize_history(chat_history):
     return clean_history
 
 
-def query_LLM(
-    prompt,
-    tokenizer,
-    model,
-    chat_history=None,
-    max_history=10,
-    style="default",
-    model_name=None,
-):
-    if chat_history is None:
-        chat_history = []
-    chat_history = chat_history[-max_history:]
+def _gemini_contents(clean_history, prompt):
+    """
+    Convert chat history to Gemini format.
+    Gemini uses 'contents' with 'parts' structure.
+    """
+    contents = []
+    for msg in clean_history:
+        role = "model" if msg["role"] == "assistant" else "user"
+        contents.append({"role": role, "parts": [{"text": msg["content"]}]})
+
+    # Add current prompt
+    contents.append({"role": "user", "parts": [{"text": prompt}]})
+    return contents
+
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# (part is a thought, currently inside a thought block) -> (tag to emit, new mode)
+_THINK_TRANSITIONS = {
+    (True, False): (THINK_OPEN, True),
+    (True, True): (None, True),
+    (False, True): (THINK_CLOSE, False),
+    (False, False): (None, False),
+}
+
+_THINKING_CONFIGS = {}  # (thinking_level, include_thoughts) -> types.ThinkingConfig
+
+
+def _thinking_config(thinking_level, include_thoughts=False):
+    key = (thinking_level, include_thoughts)
+    config = _THINKING_CONFIGS.get(key)
+    if config is None:
+        _, types = _genai()
+        params = {"thinking_level": thinking_level}
+        if include_thoughts:
+            params["include_thoughts"] = True
+        config = _THINKING_CONFIGS[key] = types.ThinkingConfig(**params)
+    return config
+
+
+def _gemini_config(system_message, model_name, include_thoughts=False):
+    _, types = _genai()
+    gen_config_params = {"system_instruction": system_message}
+
+    # Disable thinking for Gemini 2.x or models that don't support it
+    # You can adjust this condition based on specific model capabilities
+    if model_name and "gemini-2" not in model_name:
+        gen_config_params["thinking_config"] = _thinking_config(
+            "high", include_thoughts
+        )
+
+    return types.GenerateContentConfig(**gen_config_params)
+
+
+# Prebuilt system message dicts, keyed by the message text. They are shared
+# between requests and must not be mutated.
+_SYSTEM_PREFIXES = {
+    message: {"role": "system", "content": message}
+    for message in SYSTEM_MESSAGES.values()
+}
+
+
+def _openai_messages(system_message, clean_history, prompt):
+    system = _SYSTEM_PREFIXES.get(system_message) or {
+        "role": "system",
+        "content": system_message,
+    }
+    return [system, *clean_history, {"role": "user", "content": prompt}]
+
+
+def _gemini_chunk_tokens(chunk, thought_mode):
+    """
+    Split a Gemini stream chunk into output tokens, wrapping thoughts in
+    <think></think> tags.
+
+    Returns:
+        tuple: (list of tokens, updated thought_mode)
+    """
+    tokens = []
+    # Gemini chunks can contain multiple parts (thoughts or text)
+    candidates = chunk.candidates
+    content = candidates[0].content if candidates else None
+    parts = content.parts if content else None
+    if not parts:
+        return tokens, thought_mode
+
+    for part in parts:
+        text = part.text
+        is_thought = bool(part.thought)
+        # Answer parts without text leave the thought block open
+        if not (is_thought or text):
+            continue
+
+        tag, thought_mode = _THINK_TRANSITIONS[(is_thought, thought_mode)]
+        if tag:
+            tokens.append(tag)
+        if text:
+            tokens.append(text)
+
+    return tokens, thought_mode
+
+
+def _prepare_chat(chat_history, max_history, style):
+    # Keep the last max_history messages in one pass over a list or a deque;
+    # the history handed back to the caller is always a plain list, with the
+    # new turns appended after these
+    chat_history = list(deque(chat_history or (), maxlen=max_history))
 
     # Sanitize history to remove frontend-only fields
     clean_history = _sanitize_history(chat_history)
 
     system_message = SYSTEM_MESSAGES.get(style, SYSTEM_MESSAGES["default"])
+    return chat_history, clean_history, system_message
+
+
+def _is_transient_error(exc):
+    """True for rate limits, timeouts, connection and server errors."""
+    if isinstance(exc, (RateLimitExceeded, TokenBucketExhausted, httpx.TransportError)):
+        return True
+    if _openai_mod is not None and isinstance(
+        exc,
+        (
+            _openai_mod.RateLimitError,
+            _openai_mod.APITimeoutError,
+            _openai_mod.APIConnectionError,
+            _openai_mod.InternalServerError,
+        ),
+    ):
+        return True
+    if _genai_mod is not None:
+        from google.genai import errors
+
+        if isinstance(exc, errors.ServerError):
+            return True
+        if isinstance(exc, errors.ClientError) and exc.code == 429:
+            return True
+    return False
+
+
+def _failover_models(model_name):
+    """
+    Models to try, in order: the requested one, then LLM_FAILOVER.
+    Models whose provider failed in the last PROVIDER_COOLDOWN_SECONDS are
+    moved to the back of the list.
+    """
+    candidates = list(dict.fromkeys([model_name or DEFAULT_MODEL, *LLM_FAILOVER]))
+    if len(candidates) == 1:
+        return candidates
 
-    # Check if this is a Gemini model - use native SDK
-    if is_gemini_model(model_name):
-        # Check rate limit before making the call
-        if not google_rate_limiter.can_make_call():
-            stats = google_rate_limiter.get_usage_stats()
-            raise RateLimitExceeded(stats)
+    now = time.monotonic()
 
-        client = get_gemini_client(model_name)
+    def cooling_down(m):
+        failed_at = _provider_failed_at.get(get_model_provider(m))
+        return failed_at is not None and now - failed_at < PROVIDER_COOLDOWN_SECONDS
 
-        # Convert chat history to Gemini format
-        # Gemini uses 'contents' with 'parts' structure
-        contents = []
-        for msg in clean_history:
-            role = "model" if msg["role"] == "assistant" else "user"
-            contents.append({"role": role, "parts": [{"text": msg["content"]}]})
+    return sorted(candidates, key=cooling_down)
 
-        # Add current prompt
-        contents.append({"role": "user", "parts": [{"text": prompt}]})
 
-        gen_config_params = {"system_instruction": system_message}
+def _failover_delay(exc, attempt, models):
+    """
+    Re-raise exc unless it is transient and another model is left to try.
+    Returns the backoff (seconds) to wait before the next attempt.
+    """
+    if attempt == len(models) - 1 or not _is_transient_error(exc):
+        raise exc
+    model_name = models[attempt]
+    _provider_failed_at[get_model_provider(model_name)] = time.monotonic()
+    log.warning(
+        f"LLM call to {model_name} failed ({exc.__class__.__name__}: {exc}), "
+        f"failing over to {models[attempt + 1]}"
+    )
+    return LLM_FAILOVER_BACKOFF * 2**attempt
 
-        # Disable thinking for Gemini 2.x or models that don't support it
-        # You can adjust this condition based on specific model capabilities
-        if model_name and "gemini-2" not in model_name:
-            gen_config_params["thinking_config"] = types.ThinkingConfig(
-                thinking_level="high"
-            )
 
-        config = types.GenerateContentConfig(**gen_config_params)
+def _query_LLM_once(prompt, clean_history, system_message, model_name):
+    # Check if this is a Gemini model - use native SDK
+    if is_gemini_model(model_name):
+        # Check rate limit before making the call
+        acquire_rate_limit(model_name)
+
+        client = get_gemini_client(model_name)
 
         response = client.models.generate_content(
-            model=model_name or DEFAULT_MODEL, contents=contents, config=config
+            model=model_name or DEFAULT_MODEL,
+            contents=_gemini_contents(clean_history, prompt),
+            config=_gemini_config(system_message, model_name),
         )
 
         # Increment call counter after successful call
         google_rate_limiter.increment_call()
 
-        analysis = response.text
-    else:
-        # Use OpenAI-compatible client for non-Gemini models
-        _, client = load_LLM_model(model_name)
+        return response.text
 
-        messages = (
-            [{"role": "system", "content": system_message}]
-            + clean_history
-            + [{"role": "user", "content": prompt}]
-        )
+    # Use OpenAI-compatible client for non-Gemini models
+    acquire_rate_limit(model_name)
+    client = load_LLM_model(model_name)
 
-        request_kwargs = _get_request_kwargs(model_name)
+    request_kwargs = _get_request_kwargs(model_name)
 
-        response = client.chat.completions.create(
-            messages=messages, max_completion_tokens=1024, **request_kwargs
-        )
+    response = client.chat.completions.create(
+        messages=_openai_messages(system_message, clean_history, prompt),
+        max_completion_tokens=1024,
+        **request_kwargs,
+    )
 
-        analysis = response.choices[0].message.content
+    return response.choices[0].message.content
+
+
+def query_LLM(
+    prompt,
+    model,
+    chat_history=None,
+    max_history=10,
+    style="default",
+    model_name=None,
+):
+    chat_history, clean_history, system_message = _prepare_chat(
+        chat_history, max_history, style
+    )
+
+    models = _failover_models(model_name)
+    for attempt, attempt_model in enumerate(models):
+        try:
+            analysis = _query_LLM_once(
+                prompt, clean_history, system_message, attempt_model
+            )
+            break
+        except Exception as e:
+            time.sleep(_failover_delay(e, attempt, models))
 
     # Update chat history
     chat_history.append({"role": "user", "content": prompt})
@@ -775,165 +1493,570 @@ def query_LLM(
     return analysis, chat_history
 
 
+def _stream_LLM_once(prompt, clean_history, system_message, model_name):
+    # Check if this is a Gemini model - use native SDK
+    if is_gemini_model(model_name):
+        # Check rate limit before making the call
+        acquire_rate_limit(model_name)
+
+        client = get_gemini_client(model_name)
+
+        # Use streaming API
+        response_stream = client.models.generate_content_stream(
+            model=model_name or DEFAULT_MODEL,
+            contents=_gemini_contents(clean_history, prompt),
+            config=_gemini_config(system_message, model_name, include_thoughts=True),
+        )
+
+        # Increment call counter after initiating the stream
+        google_rate_limiter.increment_call()
+
+        thought_mode = False  # Track if we are currently inside a thought block
+
+        for chunk in response_stream:
+            tokens, thought_mode = _gemini_chunk_tokens(chunk, thought_mode)
+            yield from tokens
+
+        # Safety: Check if we finished the stream while still inside a thought
+        if thought_mode:
+            yield THINK_CLOSE
+    else:
+        # Use OpenAI-compatible client for non-Gemini models
+        acquire_rate_limit(model_name)
+        client = load_LLM_model(model_name)
+
+        output = client.chat.completions.create(
+            messages=_openai_messages(system_message, clean_history, prompt),
+            **_get_stream_kwargs(model_name),
+        )
+
+        for out in output:
+            if not out.choices:
+                continue
+            choice = out.choices[0]
+
+            # Standard content (emitted before the finish check, so a delta
+            # carried by the final chunk is not lost)
+            delta = choice.delta.content
+            if delta:
+                yield delta
+
+            if choice.finish_reason is not None:
+                break
+
+
 def stream_LLM(
     prompt, model, chat_history=None, max_history=10, style="default", model_name=None
 ):
-    if chat_history is None:
-        chat_history = []
-    chat_history = chat_history[-max_history:]
+    _, clean_history, system_message = _prepare_chat(chat_history, max_history, style)
 
-    # Sanitize history to remove frontend-only fields
-    clean_history = _sanitize_history(chat_history)
+    models = _failover_models(model_name)
+    for attempt, attempt_model in enumerate(models):
+        tokens = _stream_LLM_once(prompt, clean_history, system_message, attempt_model)
+        # Wait for the first token before committing to a model, so failures
+        # before any output can still fail over without the caller noticing
+        try:
+            first = next(tokens, None)
+        except Exception as e:
+            time.sleep(_failover_delay(e, attempt, models))
+            continue
 
-    system_message = SYSTEM_MESSAGES.get(style, SYSTEM_MESSAGES["default"])
+        if first is not None:
+            yield first
+            yield from tokens
+        return
 
-    # Check if this is a Gemini model - use native SDK
+
+# Streamed tokens are merged into chunks of at least LLM_STREAM_MIN_CHARS
+# characters; a shorter fragment is sent at most LLM_STREAM_MAX_DELAY seconds
+# after it arrived, even while the upstream stalls
+LLM_STREAM_MIN_CHARS = int(os.environ.get("LLM_STREAM_MIN_CHARS", "16"))
+LLM_STREAM_MAX_DELAY = float(os.environ.get("LLM_STREAM_MAX_DELAY", "0.02"))
+
+
+def coalesce_tokens(
+    tokens, min_chars=LLM_STREAM_MIN_CHARS, max_delay=LLM_STREAM_MAX_DELAY
+):
+    """
+    Merge small streamed tokens into larger chunks, so the HTTP response is
+    written (and flushed) once per chunk instead of once per token. Tokens
+    are pulled on a reader thread, so a buffered fragment is flushed on time
+    even when the next token is slow to come; errors of the token stream are
+    raised here.
+    """
+    received = queue.SimpleQueue()
+    stop = threading.Event()
+
+    def read():
+        # Items are (error, value), then None once the stream ends
+        try:
+            for token in tokens:
+                received.put((False, token))
+                if stop.is_set():
+                    break
+        except BaseException as e:
+            received.put((True, e))
+        finally:
+            close = getattr(tokens, "close", None)
+            if close is not None:
+                close()
+            received.put(None)
+
+    threading.Thread(target=read, name="coalesce-tokens", daemon=True).start()
+
+    buffer = []
+    size = 0
+    deadline = None  # when the oldest buffered token must be sent
+    try:
+        while True:
+            try:
+                item = received.get(
+                    timeout=None
+                    if deadline is None
+                    else max(0.0, deadline - time.monotonic())
+                )
+            except queue.Empty:
+                item = False  # deadline reached
+            if item:
+                failed, value = item
+                if failed:
+                    raise value
+                buffer.append(value)
+                size += len(value)
+                if deadline is None:
+                    deadline = time.monotonic() + max_delay
+            if buffer and (
+                item is None or size >= min_chars or time.monotonic() >= deadline
+            ):
+                yield "".join(buffer)
+                buffer.clear()
+                size = 0
+                deadline = None
+            if item is None:
+                return
+    finally:
+        # Stops the reader (and closes tokens) if the consumer gave up early
+        stop.set()
+
+
+async def _aquery_LLM_once(prompt, clean_history, system_message, model_name):
     if is_gemini_model(model_name):
-        # Check rate limit before making the call
-        if not google_rate_limiter.can_make_call():
-            stats = google_rate_limiter.get_usage_stats()
-            raise RateLimitExceeded(stats)
+        await aacquire_rate_limit(model_name)
 
         client = get_gemini_client(model_name)
 
-        # Convert chat history to Gemini format
-        contents = []
-        for msg in clean_history:
-            role = "model" if msg["role"] == "assistant" else "user"
-            contents.append({"role": role, "parts": [{"text": msg["content"]}]})
+        response = await client.aio.models.generate_content(
+            model=model_name or DEFAULT_MODEL,
+            contents=_gemini_contents(clean_history, prompt),
+            config=_gemini_config(system_message, model_name),
+        )
+
+        google_rate_limiter.increment_call()
 
-        # Add current prompt
-        contents.append({"role": "user", "parts": [{"text": prompt}]})
+        return response.text
 
-        gen_config_params = {"system_instruction": system_message}
+    await aacquire_rate_limit(model_name)
+    client = load_async_LLM_model(model_name)
 
-        # Disable thinking for Gemini 2.x
-        if model_name and "gemini-2" not in model_name:
-            gen_config_params["thinking_config"] = types.ThinkingConfig(
-                thinking_level="high", include_thoughts=True
+    response = await client.chat.completions.create(
+        messages=_openai_messages(system_message, clean_history, prompt),
+        max_completion_tokens=1024,
+        **_get_request_kwargs(model_name),
+    )
+
+    return response.choices[0].message.content
+
+
+async def aquery_LLM(
+    prompt, chat_history=None, max_history=10, style="default", model_name=None
+):
+    """
+    Async variant of query_LLM, for callers running an event loop.
+    Many calls can be in flight at once without pinning a thread each.
+    """
+    chat_history, clean_history, system_message = _prepare_chat(
+        chat_history, max_history, style
+    )
+
+    models = _failover_models(model_name)
+    for attempt, attempt_model in enumerate(models):
+        try:
+            analysis = await _aquery_LLM_once(
+                prompt, clean_history, system_message, attempt_model
             )
+            break
+        except Exception as e:
+            await asyncio.sleep(_failover_delay(e, attempt, models))
 
-        config = types.GenerateContentConfig(**gen_config_params)
+    chat_history.append({"role": "user", "content": prompt})
+    chat_history.append({"role": "assistant", "content": analysis})
 
-        # Use streaming API
-        response_stream = client.models.generate_content_stream(
-            model=model_name or DEFAULT_MODEL, contents=contents, config=config
+    return analysis, chat_history
+
+
+async def _astream_LLM_once(prompt, clean_history, system_message, model_name):
+    if is_gemini_model(model_name):
+        await aacquire_rate_limit(model_name)
+
+        client = get_gemini_client(model_name)
+
+        response_stream = await client.aio.models.generate_content_stream(
+            model=model_name or DEFAULT_MODEL,
+            contents=_gemini_contents(clean_history, prompt),
+            config=_gemini_config(system_message, model_name, include_thoughts=True),
         )
 
-        # Increment call counter after initiating the stream
         google_rate_limiter.increment_call()
 
-        thought_mode = False  # Track if we are currently inside a thought block
+        thought_mode = False
+        async for chunk in response_stream:
+            tokens, thought_mode = _gemini_chunk_tokens(chunk, thought_mode)
+            for token in tokens:
+                yield token
 
-        for chunk in response_stream:
-            # Gemini chunks can contain multiple parts (thoughts or text)
-            if not chunk.candidates or not chunk.candidates[0].content.parts:
+        if thought_mode:
+            yield THINK_CLOSE
+    else:
+        await aacquire_rate_limit(model_name)
+        client = load_async_LLM_model(model_name)
+
+        output = await client.chat.completions.create(
+            messages=_openai_messages(system_message, clean_history, prompt),
+            **_get_stream_kwargs(model_name),
+        )
+
+        async for out in output:
+            if not out.choices:
                 continue
+            choice = out.choices[0]
 
-            for part in chunk.candidates[0].content.parts:
-                # 1. Handle Thought Parts
-                if part.thought:
-                    # If we weren't in thought mode, open the tag
-                    if not thought_mode:
-                        yield "<think>"
-                        thought_mode = True
+            delta = choice.delta.content
+            if delta:
+                yield delta
 
-                    yield part.text
+            if choice.finish_reason is not None:
+                break
 
-                # 2. Handle Answer Parts (part.thought is False, but text exists)
-                elif part.text:
-                    # If we were in thought mode, we must close it now
-                    if thought_mode:
-                        yield "</think>"
-                        thought_mode = False
 
-                    yield part.text
+async def astream_LLM(
+    prompt, chat_history=None, max_history=10, style="default", model_name=None
+):
+    """Async variant of stream_LLM, yielding the same tokens."""
+    _, clean_history, system_message = _prepare_chat(chat_history, max_history, style)
 
-        # Safety: Check if we finished the stream while still inside a thought
-        if thought_mode:
-            yield "</think>"
-    else:
-        # Use OpenAI-compatible client for non-Gemini models
-        _, client = load_LLM_model(model_name)
+    models = _failover_models(model_name)
+    for attempt, attempt_model in enumerate(models):
+        tokens = _astream_LLM_once(
+            prompt, clean_history, system_message, attempt_model
+        )
+        try:
+            first = await tokens.__anext__()
+        except StopAsyncIteration:
+            return
+        except Exception as e:
+            await asyncio.sleep(_failover_delay(e, attempt, models))
+            continue
+
+        yield first
+        async for token in tokens:
+            yield token
+        return
+
+
+# Upper bound for concurrent requests in query_LLM_batch
+LLM_BATCH_CONCURRENCY = int(os.environ.get("LLM_BATCH_CONCURRENCY", "8"))
+
+
+def query_LLM_batch(prompts, model_name=None, style="default", use_batch_api=False):
+    """
+    Run independent single-turn queries for many prompts.
+
+    By default the prompts are sent concurrently through query_LLM, at most
+    LLM_BATCH_CONCURRENCY (and the provider's burst size) at a time; prompts
+    that find the per-minute budget exhausted wait for it and retry, so a
+    large batch is paced by the provider's rate limit instead of failing. With
+    use_batch_api=True the prompts are submitted instead to the provider's
+    asynchronous Batch API (OpenAI-compatible providers only, cheaper but with
+    delayed results); poll get_LLM_batch_results with the returned batch id.
+
+    Returns:
+        list: The answers, in prompt order, or the batch id if use_batch_api.
+    """
+    if use_batch_api:
+        return submit_LLM_batch(prompts, model_name, style)
+
+    limiter = PROVIDER_LIMITERS.get(get_model_provider(model_name))
+    workers = LLM_BATCH_CONCURRENCY
+    if isinstance(limiter, TokenBucket):
+        workers = min(workers, int(limiter.capacity))
+    workers = max(1, min(workers, len(prompts)))
+
+    def run(prompt):
+        while True:
+            try:
+                analysis, _ = query_LLM(
+                    prompt, None, style=style, model_name=model_name
+                )
+                return analysis
+            except TokenBucketExhausted as e:
+                time.sleep(e.retry_after)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, prompts))
+
+
+async def aquery_LLM_batch(prompts, model_name=None, style="default"):
+    """
+    Async variant of query_LLM_batch: runs aquery_LLM for every prompt with
+    asyncio.gather, at most LLM_BATCH_CONCURRENCY at a time.
 
-        messages = (
-            [{"role": "system", "content": system_message}]
-            + clean_history
-            + [{"role": "user", "content": prompt}]
+    Returns:
+        list: The answers, in prompt order.
+    """
+    semaphore = asyncio.Semaphore(LLM_BATCH_CONCURRENCY)
+
+    async def run(prompt):
+        async with semaphore:
+            analysis, _ = await aquery_LLM(prompt, style=style, model_name=model_name)
+            return analysis
+
+    return await asyncio.gather(*(run(prompt) for prompt in prompts))
+
+
+# Clients that submitted the recent batches, by batch id
+_BATCH_CLIENTS = LRUCache(maxsize=1024)
+
+
+def submit_LLM_batch(prompts, model_name=None, style="default"):
+    """
+    Submit prompts to an OpenAI-compatible Batch API (e.g. Groq).
+
+    Returns:
+        str: The batch id.
+    """
+    if is_gemini_model(model_name):
+        raise ValueError("The Batch API is only supported for OpenAI-compatible models")
+
+    system_message = SYSTEM_MESSAGES.get(style, SYSTEM_MESSAGES["default"])
+    request_kwargs = _get_request_kwargs(model_name)
+    lines = [
+        fastJson.dumps_bytes(
+            {
+                "custom_id": str(idx),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "messages": _openai_messages(system_message, [], prompt),
+                    "max_completion_tokens": 1024,
+                    **request_kwargs,
+                },
+            }
         )
+        for idx, prompt in enumerate(prompts)
+    ]
 
-        request_kwargs = _get_request_kwargs(model_name)
+    client = load_LLM_model(model_name)
+    batch_file = client.files.create(
+        file=("batch.jsonl", b"\n".join(lines)), purpose="batch"
+    )
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h",
+    )
+    # Batches are only visible to the key that created them
+    _BATCH_CLIENTS.put(batch.id, client)
+    log.info(f"Submitted LLM batch {batch.id} with {len(prompts)} prompts")
+    return batch.id
 
-        # Add stream specific params
-        request_kwargs["stream"] = True
-        # Higher limit for thinking models
-        request_kwargs["max_completion_tokens"] = 4096 * 8
 
-        output = client.chat.completions.create(messages=messages, **request_kwargs)
+def get_LLM_batch_results(batch_id, model_name=None):
+    """
+    Fetch the results of a batch submitted with submit_LLM_batch, using the
+    client (and so the API key) that submitted it. Batches submitted by
+    another process are polled with the next key of the model's provider.
 
-        for out in output:
-            if out.choices[0].finish_reason is not None:
-                break
+    Returns:
+        list or None: Answers in prompt order (None for failed requests),
+        or None if the batch has not completed yet.
+    """
+    client = _BATCH_CLIENTS.get(batch_id) or load_LLM_model(model_name)
+    batch = client.batches.retrieve(batch_id)
+    if batch.status != "completed":
+        log.info(f"LLM batch {batch_id} status: {batch.status}")
+        return None
 
-            # Standard content
-            delta = out.choices[0].delta.content
-            if delta:
-                yield delta
+    results = {}
+    if batch.output_file_id:
+        for line in client.files.content(batch.output_file_id).text.splitlines():
+            if not line.strip():
+                continue
+            entry = fastJson.loads(line)
+            response = entry.get("response") or {}
+            body = response.get("body") or {}
+            choices = body.get("choices") or []
+            if choices:
+                results[int(entry["custom_id"])] = choices[0]["message"]["content"]
+
+    total = batch.request_counts.total if batch.request_counts else len(results)
+    return [results.get(idx) for idx in range(total)]
 
 
-def is_chess_related(question, tokenizer, model, model_name=None):
-    system_message = """You are a filtering agent.
+_CHESS_FILTER_SYSTEM_MESSAGE = """You are a filtering agent.
 Your job is to decide if the text is chess-related.
 Keep context in mind.
 Only answer with a "yes" or a "no".
-"""
-    user_message = question + "Is this question chess-related?"
+""".strip()
+
+
+# Questions are answered as chess-related without asking the LLM when they
+# match _CHESS_RE (terms and notation only chess uses), or both a common word
+# with a chess meaning (_CHESS_TERM_RE) and a square or SAN move
+# (_CHESS_SQUARE_RE): "Queen Elizabeth" or "Audi A4" alone are left to the LLM.
+# Notation is case-sensitive, as in chess it is always written.
+_CHESS_RE = re.compile(
+    r"\b(?:(?i:chess|checkmate|en passant|zugzwang|middlegame|pgn)|FEN|"
+    r"[a-h][1-8][a-h][1-8][qrbn]?|O-O(?:-O)?)(?!\w)"
+)
+_CHESS_TERM_RE = re.compile(
+    r"\b(?:pawns?|knights?|bishops?|rooks?|queens?|kings?|stalemate|"
+    r"castl(?:e|es|ed|ing)|gambit|endgame)(?!\w)",
+    re.IGNORECASE,
+)
+_CHESS_SQUARE_RE = re.compile(r"\b(?:[KQRBN][a-h]?[1-8]?x?)?[a-h][1-8][+#]?(?!\w)")
+
+
+def _looks_chess_related(question):
+    """Whether the question is obviously about chess (see _CHESS_RE)."""
+    return bool(
+        _CHESS_RE.search(question)
+        or (_CHESS_TERM_RE.search(question) and _CHESS_SQUARE_RE.search(question))
+    )
+
+
+# "yes" and "no" are single tokens, so one greedy token is the whole answer
+_CHESS_FILTER_KWARGS = {"max_completion_tokens": 1, "temperature": 0}
+
+
+def _chess_related_key(question, model_name):
+    question_hash = hashlib.blake2b(
+        question.strip().lower().encode()
+    ).hexdigest()[:16]
+    return (question_hash, model_name)
+
+
+def _chess_filter_message(question):
+    return question + "Is this question chess-related?"
+
+
+def _chess_filter_gemini_config():
+    _, types = _genai()
+    return types.GenerateContentConfig(
+        system_instruction=_CHESS_FILTER_SYSTEM_MESSAGE,
+        thinking_config=_thinking_config("minimal"),  # Fast filtering
+    )
+
+
+_YES_ANSWERS = frozenset({"yes", "y"})
+
+
+def _is_yes(response_text):
+    return (response_text or "").strip().rstrip(".!").lower() in _YES_ANSWERS
+
+
+def is_chess_related(question, model, model_name=None):
+    """
+    Ask the LLM whether the question is chess-related.
+    Questions with obvious chess vocabulary or notation (_looks_chess_related)
+    are accepted without a call. Answers are cached per normalized question and model, so repeated
+    questions skip the round trip (and the Google rate limiter) entirely.
+    """
+    if _looks_chess_related(question):
+        return True
+
+    cache_key = _chess_related_key(question, model_name)
+
+    cached = _CHESS_RELATED_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    result = _is_chess_related_uncached(question, model_name)
+    _CHESS_RELATED_CACHE.put(cache_key, result)
+    return result
+
+
+def _is_chess_related_uncached(question, model_name=None):
+    user_message = _chess_filter_message(question)
 
     # Check if this is a Gemini model - use native SDK
     if is_gemini_model(model_name):
         # Check rate limit before making the call
-        if not google_rate_limiter.can_make_call():
-            stats = google_rate_limiter.get_usage_stats()
-            raise RateLimitExceeded(stats)
+        acquire_rate_limit(model_name)
 
         client = get_gemini_client(model_name)
 
-        config = types.GenerateContentConfig(
-            system_instruction=system_message,
-            thinking_config=types.ThinkingConfig(
-                thinking_level="minimal"  # Fast filtering
-            ),
-        )
-
         response = client.models.generate_content(
-            model=model_name or DEFAULT_MODEL, contents=user_message, config=config
+            model=model_name or DEFAULT_MODEL,
+            contents=user_message,
+            config=_chess_filter_gemini_config(),
         )
 
         # Increment call counter after successful call
         google_rate_limiter.increment_call()
 
-        response_text = response.text.strip().lower()
-    else:
-        # Use OpenAI-compatible client for non-Gemini models
-        _, client = load_LLM_model(model_name)
+        return _is_yes(response.text)
 
-        messages = [
-            {
-                "role": "system",
-                "content": system_message,
-            },
-            {"role": "user", "content": user_message},
-        ]
+    # Use OpenAI-compatible client for non-Gemini models
+    acquire_rate_limit(model_name)
+    client = load_LLM_model(model_name)
+
+    output = client.chat.completions.create(
+        messages=_openai_messages(_CHESS_FILTER_SYSTEM_MESSAGE, [], user_message),
+        **_CHESS_FILTER_KWARGS,
+        **_get_request_kwargs(model_name),
+    )
 
-        request_kwargs = _get_request_kwargs(model_name)
+    return _is_yes(output.choices[0].message.content)
 
-        output = client.chat.completions.create(
-            messages=messages, max_completion_tokens=256, **request_kwargs
+
+async def ais_chess_related(question, model_name=None):
+    """
+    Async variant of is_chess_related, sharing its cache. Meant to be gathered
+    with the answer stream so the filter round trip overlaps with it.
+    """
+    if _looks_chess_related(question):
+        return True
+
+    cache_key = _chess_related_key(question, model_name)
+
+    cached = _CHESS_RELATED_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    user_message = _chess_filter_message(question)
+    await aacquire_rate_limit(model_name)
+
+    if is_gemini_model(model_name):
+        client = get_gemini_client(model_name)
+        response = await client.aio.models.generate_content(
+            model=model_name or DEFAULT_MODEL,
+            contents=user_message,
+            config=_chess_filter_gemini_config(),
         )
+        google_rate_limiter.increment_call()
+        result = _is_yes(response.text)
+    else:
+        client = load_async_LLM_model(model_name)
+        output = await client.chat.completions.create(
+            messages=_openai_messages(_CHESS_FILTER_SYSTEM_MESSAGE, [], user_message),
+            **_CHESS_FILTER_KWARGS,
+            **_get_request_kwargs(model_name),
+        )
+        result = _is_yes(output.choices[0].message.content)
 
-        response_text = output.choices[0].message.content.strip().lower()
+    _CHESS_RELATED_CACHE.put(cache_key, result)
+    return result
 
-    return response_text in ["yes", "yes."]
 
 def evaluate_analysis(fen, advice, evaluator_model_name=None, engine_context=None):
     """
@@ -952,7 +2075,7 @@ def evaluate_analysis(fen, advice, evaluator_model_name=None, engine_context=Non
     try:
         # Use style="evaluator" to set the system message
         response_text, _ = query_LLM(
-            prompt, None, None, style="evaluator", model_name=evaluator_model_name
+            prompt, None, style="evaluator", model_name=evaluator_model_name
         )
 
         # Parse JSON
@@ -967,9 +2090,7 @@ def evaluate_analysis(fen, advice, evaluator_model_name=None, engine_context=Non
         result = json.loads(text)
         
         # Add friendly model name
-        model_info = next(
-            (m for m in SUPPORTED_MODELS if m["id"] == evaluator_model_name), None
-        )
+        model_info = _MODEL_INDEX.get(evaluator_model_name)
         result["model_name"] = model_info["name"] if model_info else evaluator_model_name
         
         return result
@@ -14,35 +14,56 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
-from flask import Flask, request, Response, stream_with_context, jsonify, json
+from flask import Flask, request, Response, jsonify
+from flask.json.provider import DefaultJSONProvider
 from prometheus_client import (
-    Summary,
+    Histogram,
     Counter,
     Gauge,
     generate_latest,
     CONTENT_TYPE_LATEST,
 )
 from flask_cors import CORS
+import atexit
 import logging
+import os
+import queue
+import subprocess
+import threading
 import time
+from logging.handlers import QueueHandler, QueueListener
+import functools
 from functools import wraps
 import chess
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, ValidationError, field_validator, model_validator
+
+try:
+    import msgpack
+except ImportError:  # optional, see requirements.txt
+    msgpack = None
 
 import LLMHandler
 import engineCommunication
+import fastJson
 from engineCache import get_cache
+from google_rate_limiter import RateLimitExceeded
+from token_bucket import TokenBucketExhausted
 
 # Prometheus metrics
 REQUEST_COUNT = Counter(
     "shashguru_requests_total",
-    "Total number of requests by endpoint",
+    "Total number of requests by endpoint and status class",
     ["endpoint", "method", "status"],
 )
 
-REQUEST_DURATION = Summary(
+# Buckets sized for engine searches and LLM calls, from sub-second cache
+# hits up to long completions
+REQUEST_DURATION = Histogram(
     "shashguru_request_duration_seconds",
     "Request duration in seconds by endpoint",
-    ["endpoint", "method"],
+    ["endpoint"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120),
 )
 
 ACTIVE_REQUESTS = Gauge(
@@ -51,38 +72,80 @@ ACTIVE_REQUESTS = Gauge(
 
 ERROR_COUNT = Counter(
     "shashguru_errors_total",
-    "Total number of errors by endpoint",
+    "Total number of errors by endpoint and error category",
     ["endpoint", "error_type"],
 )
 
-# Global variables for model and tokenizer
-tokenizer = None
+logger = logging.getLogger(__name__)
+
+# Global LLM client
 model = None
 
+# Content types of the analysis responses, JSON first so it wins ties (*/*)
+_BODY_MIMETYPES = ["application/json", "application/msgpack"]
+
+# Streamed responses must reach the client as they are produced: tell nginx
+# (X-Accel-Buffering) and other proxies not to buffer them. The streaming
+# generators only use values read from the request up front, so they are
+# handed to the WSGI server directly instead of through stream_with_context,
+# which would wrap every chunk in a request-context push/pop.
+STREAM_HEADERS = {"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+
+
+# Exceptions raised by the LLM provider SDKs, recognized by their top-level
+# module so the SDKs need not be imported here
+_LLM_ERROR_MODULES = frozenset({"openai", "google", "httpx", "httpcore"})
+
+
+def _status_class(status):
+    """Status label value: the status class ("2xx", "4xx", ...) of the code."""
+    return f"{int(status) // 100}xx"
+
+
+def _error_type(exc):
+    """Error label value: one of a fixed set of categories for the exception."""
+    if isinstance(exc, (RateLimitExceeded, TokenBucketExhausted)):
+        return "llm"
+    module = type(exc).__module__.partition(".")[0]
+    if module in _LLM_ERROR_MODULES:
+        return "llm"
+    if module == "redis":
+        return "redis"
+    if isinstance(exc, (ValueError, KeyError, TypeError)):
+        return "validation"
+    if isinstance(exc, (RuntimeError, OSError, subprocess.SubprocessError)):
+        return "engine"
+    return "other"
+
 
 def track_metrics(endpoint_name):
     """Decorator to track metrics for endpoints"""
 
+    # The per-endpoint children are bound once, so requests skip the
+    # labels() lookup (and its lock) for them
+    active_requests = ACTIVE_REQUESTS.labels(endpoint=endpoint_name)
+    request_duration = REQUEST_DURATION.labels(endpoint=endpoint_name)
+
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             method = request.method
-            start_time = time.time()
+            start_time = time.perf_counter()
 
             # Increment active requests
-            ACTIVE_REQUESTS.labels(endpoint=endpoint_name).inc()
+            active_requests.inc()
 
             try:
                 # Execute the function
                 response = func(*args, **kwargs)
 
-                # Determine status code
+                # Determine status class
                 if hasattr(response, "status_code"):
-                    status = str(response.status_code)
+                    status = _status_class(response.status_code)
                 elif isinstance(response, tuple) and len(response) > 1:
-                    status = str(response[1])
+                    status = _status_class(response[1])
                 else:
-                    status = "200"
+                    status = "2xx"
 
                 # Record successful request
                 REQUEST_COUNT.labels(
@@ -93,42 +156,85 @@ def track_metrics(endpoint_name):
 
             except Exception as e:
                 # Record error
-                error_type = type(e).__name__
                 REQUEST_COUNT.labels(
-                    endpoint=endpoint_name, method=method, status="500"
+                    endpoint=endpoint_name, method=method, status="5xx"
+                ).inc()
+                ERROR_COUNT.labels(
+                    endpoint=endpoint_name, error_type=_error_type(e)
                 ).inc()
-                ERROR_COUNT.labels(endpoint=endpoint_name, error_type=error_type).inc()
                 raise
 
             finally:
                 # Record duration and decrement active requests
-                duration = time.time() - start_time
-                REQUEST_DURATION.labels(endpoint=endpoint_name, method=method).observe(
-                    duration
-                )
-                ACTIVE_REQUESTS.labels(endpoint=endpoint_name).dec()
+                request_duration.observe(time.perf_counter() - start_time)
+                active_requests.dec()
 
         return wrapper
 
     return decorator
 
 
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider backed by fastJson (orjson when installed), used by
+    jsonify and request.get_json. Values orjson cannot serialize go through
+    Flask's default encoder.
+    """
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return fastJson.dumps(obj)
+        except TypeError:
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return fastJson.loads(s)
+
+
+_model_lock = threading.Lock()
+
+
 def load_models():
-    """Load the LLM model and tokenizer - called once at startup"""
-    global tokenizer, model
-    if tokenizer is None or model is None:
-        logging.info("Loading LLM model...")
-        tokenizer, model = LLMHandler.load_LLM_model()
-        logging.info("Model loaded successfully.")
+    """Load the LLM model once (thread-safe) and return it."""
+    global model
+    if model is None:
+        with _model_lock:
+            if model is None:
+                logger.info("Loading LLM model...")
+                model = LLMHandler.load_LLM_model()
+                logger.info("Model loaded successfully.")
+    return model
+
+
+def configure_logging():
+    """
+    Move the root logger's handlers behind a queue, so request threads only
+    enqueue records and the actual log I/O happens on a listener thread.
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, QueueHandler) for h in root.handlers):
+        return
+    handlers = root.handlers[:] or [logging.StreamHandler()]
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    listener.start()
+    atexit.register(listener.stop)
 
 
 def create_app():
     """Application factory function"""
+    configure_logging()
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     CORS(app)
 
-    # Load models when creating the app
-    load_models()
+    # Load models in the background, so importing the app never blocks on
+    # it; /health reports model_loaded=false until it is done, and requests
+    # arriving earlier load it themselves
+    threading.Thread(target=load_models, name="load-models", daemon=True).start()
 
     return app
 
@@ -136,25 +242,38 @@ def create_app():
 app = create_app()
 
 
+# Health responses, built once: load balancers poll them constantly
+_HEALTH_BODIES = {
+    loaded: fastJson.dumps_bytes({"status": "healthy", "model_loaded": loaded})
+    for loaded in (False, True)
+}
+
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint for load balancers and monitoring"""
-    return (
-        jsonify(
-            {
-                "status": "healthy",
-                "model_loaded": model is not None,
-                "tokenizer_loaded": tokenizer is not None,
-            }
-        ),
-        200,
-    )
+    return Response(_HEALTH_BODIES[model is not None], mimetype="application/json")
+
+
+# Rendered exposition reused for METRICS_CACHE_SECONDS, so several scrapers
+# (or a fast scrape interval) do not render every series each time
+METRICS_CACHE_SECONDS = 1.0
+_metrics_cache = (float("-inf"), b"")
+_metrics_lock = threading.Lock()
 
 
 @app.route("/metrics", methods=["GET"])
 def metrics():
     """Prometheus metrics endpoint"""
-    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+    global _metrics_cache
+    rendered_at, body = _metrics_cache
+    if time.monotonic() - rendered_at > METRICS_CACHE_SECONDS:
+        with _metrics_lock:
+            rendered_at, body = _metrics_cache
+            if time.monotonic() - rendered_at > METRICS_CACHE_SECONDS:
+                body = generate_latest()
+                _metrics_cache = (time.monotonic(), body)
+    return Response(body, mimetype=CONTENT_TYPE_LATEST)
 
 
 @app.route("/llm/models", methods=["GET"])
@@ -166,15 +285,18 @@ def get_models():
 @app.route("/analysis", methods=["GET", "POST"])
 @track_metrics("analysis")
 def analysis():
-    fen = request.json.get("fen")
-    depth = request.json.get("depth", 20)
-    style = request.json.get("style", "default")
-    model_name = request.json.get("model")  # Get selected model
-    evaluator_model_name = request.json.get("evaluator_model")  # Get selected evaluator model
+    data = request.get_json()
+    fen = data.get("fen")
+    depth = data.get("depth", 20)
+    style = data.get("style", "default")
+    model_name = data.get("model")  # Get selected model
+    evaluator_model_name = data.get("evaluator_model")  # Get selected evaluator model
 
     # Request 3 lines for multiple move analysis for complex personas
     lines = 1 if style == "default" else 3
     bestmoves, ponder = engineCommunication.call_engine(fen, depth, lines=lines)
+    # Warm the cache for the position expected next, while the LLM answers
+    engineCommunication.prefetch_reply_position(fen, bestmoves, ponder, depth, lines=lines)
     prompt = LLMHandler.create_prompt_single_engine(fen, bestmoves, ponder, style)
 
     ############################
@@ -184,19 +306,21 @@ def analysis():
     # prompt = LLMHandler.create_prompt_double_engine(fen, engine_analysis)
 
     def generate():
-        yield json.dumps(
-            {"prompt": prompt}
-        ) + "\n[PROMPT_END]\n"  # sends single chunk with prompt, to save it as context for responses
-        yield "[START_STREAM]\n"  # optional: delimiter for stream start
-        
-        full_response = ""
+        # Single chunk with the prompt, to save it as context for responses,
+        # and the delimiter for stream start
+        yield fastJson.dumps({"prompt": prompt}) + "\n[PROMPT_END]\n[START_STREAM]\n"
+
+        response_parts = []
         # Pass model_name to stream_LLM
-        for token in LLMHandler.stream_LLM(
-            prompt, model, style=style, model_name=model_name
+        for chunk in LLMHandler.coalesce_tokens(
+            LLMHandler.stream_LLM(
+                prompt, load_models(), style=style, model_name=model_name
+            )
         ):
-            full_response += token
-            yield token
+            response_parts.append(chunk)
+            yield chunk
         yield "\n[END_STREAM]"  # optional: delimiter for stream end
+        full_response = "".join(response_parts)
 
         # Self-Correction/Evaluation
         try:
@@ -208,11 +332,15 @@ def analysis():
                     engine_context=str(bestmoves)
                 )
                 if eval_result:
-                    yield "\n[EVALUATION]" + json.dumps(eval_result)
+                    yield "\n[EVALUATION]" + fastJson.dumps(eval_result)
         except Exception as e:
-            logging.error(f"Error during analysis evaluation: {e}")
+            logger.error("Error during analysis evaluation: %s", e)
 
-    return Response(stream_with_context(generate()), mimetype="text/plain")
+    return Response(
+        generate(),
+        mimetype="text/plain",
+        headers=STREAM_HEADERS,
+    )
 
 
 @app.route("/response", methods=["GET", "POST"])
@@ -230,18 +358,21 @@ def response():
     def generate():
         yield "[START_STREAM]\n"
         
-        full_response = ""
+        response_parts = []
         # Pass model_name to stream_LLM
-        for token in LLMHandler.stream_LLM(
-            new_question,
-            model,
-            chat_history=chat_history[:-1],
-            style=style,
-            model_name=model_name,
+        for chunk in LLMHandler.coalesce_tokens(
+            LLMHandler.stream_LLM(
+                new_question,
+                load_models(),
+                chat_history=chat_history[:-1],
+                style=style,
+                model_name=model_name,
+            )
         ):
-            full_response += token
-            yield token
+            response_parts.append(chunk)
+            yield chunk
         yield "\n[END_STREAM]"
+        full_response = "".join(response_parts)
         
         # Evaluation if FEN is provided
         if fen:
@@ -253,11 +384,51 @@ def response():
                         evaluator_model_name
                     )
                     if eval_result:
-                        yield "\n[EVALUATION]" + json.dumps(eval_result)
+                        yield "\n[EVALUATION]" + fastJson.dumps(eval_result)
              except Exception as e:
-                logging.error(f"Error during response evaluation: {e}")
+                logger.error("Error during response evaluation: %s", e)
+
+    return Response(
+        generate(),
+        mimetype="text/plain",
+        headers=STREAM_HEADERS,
+    )
+
+
+def encoded_response(body):
+    """
+    Response with body as msgpack for clients preferring application/msgpack
+    (when msgpack is installed), as JSON otherwise.
+    """
+    if (
+        msgpack is not None
+        and request.accept_mimetypes.best_match(_BODY_MIMETYPES) == "application/msgpack"
+    ):
+        return Response(
+            msgpack.packb(body, use_bin_type=True), mimetype="application/msgpack"
+        )
+    return jsonify(body)
+
+
+def _format_evaluation_line(move_data):
+    """One engine line as the frontend expects it in /evaluation."""
+    pv_moves = move_data.get("pv_moves")
+    score = move_data["score"]
+    mate = move_data["mate"]
+    return {
+        "moves": " ".join(pv_moves) if pv_moves else (move_data["move"] or ""),
+        "evaluation": (
+            score if score is not None else (1000 + mate if mate is not None else 0)
+        ),
+    }
 
-    return Response(stream_with_context(generate()), mimetype="text/plain")
+
+class EvaluationRequest(BaseModel):
+    """Body of /evaluation."""
+
+    fen: Optional[str] = None
+    depth: int = 15
+    lines: int = 3
 
 
 @app.route("/evaluation", methods=["GET", "POST"])
@@ -267,16 +438,21 @@ def evaluation():
     Returns engine evaluation for a given FEN position.
     """
     try:
-        data = request.get_json()
-        fen = data.get("fen")
-        depth = data.get("depth", 15)
-        lines = data.get("lines", 3)
-
-        if not fen:
+        try:
+            req = EvaluationRequest.model_validate_json(request.get_data())
+        except ValidationError as ve:
+            return jsonify({"error": _validation_message(ve)}), 400
+        if not req.fen:
             return jsonify({"error": "FEN is required"}), 400
-
-        print(
-            f"Received evaluation request for FEN: {fen}, depth: {depth}, lines: {lines}"
+        fen = req.fen
+        depth = req.depth
+        lines = req.lines
+
+        logger.info(
+            "Received evaluation request for FEN: %s, depth: %s, lines: %s",
+            fen,
+            depth,
+            lines,
         )
 
         # Get engine analysis
@@ -327,32 +503,17 @@ def evaluation():
                 "mate": bestmoves[0]["mate"] if bestmoves else None,
                 "winprob": bestmoves[0]["winprob"] if bestmoves else None,
                 "lines": [
-                    {
-                        "moves": (
-                            " ".join(move_data["pv_moves"])
-                            if "pv_moves" in move_data and move_data["pv_moves"]
-                            else (move_data["move"] if move_data["move"] else "")
-                        ),
-                        "evaluation": (
-                            move_data["score"]
-                            if move_data["score"] is not None
-                            else (
-                                1000 + move_data["mate"]
-                                if move_data["mate"] is not None
-                                else 0
-                            )
-                        ),
-                    }
+                    _format_evaluation_line(move_data)
                     for move_data in bestmoves[:lines]
                     if move_data is not None
                 ],
             }
         }
 
-        return jsonify(evaluation_data)
+        return encoded_response(evaluation_data)
 
     except Exception as e:
-        print(f"Error in evaluation endpoint: {e}")
+        logger.error("Error in evaluation endpoint: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -366,7 +527,29 @@ def cache_stats():
         stats = cache.get_cache_stats()
         return jsonify(stats)
     except Exception as e:
-        print(f"Error getting cache stats: {e}")
+        logger.error("Error getting cache stats: %s", e)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route("/cache/has", methods=["GET"])
+def cache_has():
+    """
+    Tells whether an analysis of a position is cached at sufficient depth,
+    so a client can avoid triggering a long engine search.
+
+    Query parameters: fen (required), depth (default 15), lines (default 3).
+    """
+    fen = request.args.get("fen")
+    depth = request.args.get("depth", 15, type=int)
+    lines = request.args.get("lines", 3, type=int)
+    if not fen:
+        return jsonify({"error": "FEN is required"}), 400
+
+    try:
+        cached = get_cache().has_sufficient_depth(fen, depth, lines)
+        return jsonify({"cached": cached})
+    except Exception as e:
+        logger.error("Error checking cache: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -380,16 +563,57 @@ def clear_cache():
         cache.clear_cache()
         return jsonify({"message": "Cache cleared successfully"})
     except Exception as e:
-        print(f"Error clearing cache: {e}")
+        logger.error("Error clearing cache: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+ENGINE_PATHS = {
+    "NNUE": engineCommunication.engine_path_NNUE,
+    "HUMAN": engineCommunication.engine_path_HUMAN,
+}
+
+
+class PgnAnalysisRequest(BaseModel):
+    """Body of /pgn-analysis, checked in a single pydantic validation pass."""
+
+    pgn: Optional[str] = None
+    moves: Optional[List[str]] = None
+    depth: int = Field(15, ge=1, le=30)
+    lines: int = Field(3, ge=1, le=10)
+    engine: Literal["NNUE", "HUMAN"] = "NNUE"
+
+    @field_validator("engine", mode="before")
+    @classmethod
+    def _engine_upper(cls, value):
+        return value.upper() if isinstance(value, str) else value
+
+    @model_validator(mode="after")
+    def _single_game_source(self):
+        if not self.pgn and not self.moves:
+            raise ValueError("Either 'pgn' or 'moves' is required")
+        if self.pgn and self.moves:
+            raise ValueError("Provide either 'pgn' or 'moves', not both")
+        return self
+
+
+def _validation_message(exc):
+    """Short message for the first error of a pydantic ValidationError."""
+    error = exc.errors()[0]
+    # Errors raised by the validators carry their own message
+    message = (
+        str(error["ctx"]["error"]) if error["type"] == "value_error" else error["msg"]
+    )
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {message}" if location else message
+
+
 @app.route("/pgn-analysis", methods=["POST"])
 @track_metrics("pgn_analysis")
 def pgn_analysis():
     """
-    Analyzes a complete PGN game using a dedicated engine instance.
-    More efficient for game analysis as the engine can reuse hash table entries.
+    Analyzes a complete PGN game, searching the positions missing from the
+    cache on the engine pool or on a dedicated engine instance
+    (see engineCommunication.analyze_pgn_game).
 
     Expected JSON payload:
     {
@@ -399,75 +623,73 @@ def pgn_analysis():
         "engine": "NNUE" or "HUMAN" (optional, default: "NNUE")
     }
 
-    Returns JSON with analysis for each position in the game.
+    Returns JSON with analysis for each position in the game, or, with
+    "Accept: application/x-ndjson", streams one JSON line per position
+    followed by a {"metadata": ...} line.
     """
     try:
-        data = request.get_json()
-
-        # Get PGN or moves
-        pgn_string = data.get("pgn")
-        moves_list = data.get("moves")
-
-        if not pgn_string and not moves_list:
-            return jsonify({"error": "Either 'pgn' or 'moves' is required"}), 400
-
-        if pgn_string and moves_list:
-            return jsonify({"error": "Provide either 'pgn' or 'moves', not both"}), 400
-
-        # Get optional parameters
-        depth = data.get("depth", 15)
-        lines = data.get("lines", 3)
-        engine_type = data.get("engine", "NNUE").upper()
-
-        # Validate parameters
-        if depth < 1 or depth > 30:
-            return jsonify({"error": "Depth must be between 1 and 30"}), 400
-
-        if lines < 1 or lines > 10:
-            return jsonify({"error": "Lines must be between 1 and 10"}), 400
-
-        if engine_type not in ["NNUE", "HUMAN"]:
-            return jsonify({"error": "Engine must be 'NNUE' or 'HUMAN'"}), 400
-
-        # Select engine path
-        engine_path = (
-            engineCommunication.engine_path_NNUE
-            if engine_type == "NNUE"
-            else engineCommunication.engine_path_HUMAN
+        try:
+            req = PgnAnalysisRequest.model_validate_json(request.get_data())
+        except ValidationError as ve:
+            return jsonify({"error": _validation_message(ve)}), 400
+
+        pgn_string = req.pgn
+        moves_list = req.moves
+        depth = req.depth
+        lines = req.lines
+        engine_type = req.engine
+
+        engine_path = ENGINE_PATHS[engine_type]
+
+        logger.info(
+            "Received PGN analysis request: depth=%s, lines=%s, engine=%s",
+            depth,
+            lines,
+            engine_type,
         )
 
-        print(
-            f"Received PGN analysis request: depth={depth}, lines={lines}, engine={engine_type}"
-        )
+        metadata = {"depth": depth, "lines": lines, "engine": engine_type}
 
-        # Perform analysis
-        if pgn_string:
-            analysis_results = engineCommunication.analyze_pgn_game(
-                pgn_string, depth, lines, engine_path
+        # Clients accepting NDJSON get one line per position as soon as it is
+        # analyzed, then a final metadata line
+        if request.accept_mimetypes.best == "application/x-ndjson":
+            positions = engineCommunication.iter_analyze_pgn_game(
+                pgn_string or moves_list, depth, lines, engine_path
             )
-        else:
-            analysis_results = engineCommunication.analyze_pgn_game(
-                moves_list, depth, lines, engine_path
+
+            def generate():
+                total = 0
+                for position in positions:
+                    total += 1
+                    yield fastJson.dumps(position) + "\n"
+                yield fastJson.dumps(
+                    {"metadata": {"total_positions": total, **metadata}}
+                ) + "\n"
+
+            return Response(
+                generate(),
+                mimetype="application/x-ndjson",
+                headers=STREAM_HEADERS,
             )
 
-        return jsonify(
+        # Perform analysis
+        analysis_results = engineCommunication.analyze_pgn_game(
+            pgn_string or moves_list, depth, lines, engine_path
+        )
+
+        return encoded_response(
             {
                 "success": True,
                 "game_analysis": analysis_results,
-                "metadata": {
-                    "total_positions": len(analysis_results),
-                    "depth": depth,
-                    "lines": lines,
-                    "engine": engine_type,
-                },
+                "metadata": {"total_positions": len(analysis_results), **metadata},
             }
         )
 
     except ValueError as ve:
-        print(f"Validation error in PGN analysis: {ve}")
+        logger.warning("Validation error in PGN analysis: %s", ve)
         return jsonify({"error": str(ve)}), 400
     except Exception as e:
-        print(f"Error in PGN analysis endpoint: {e}")
+        logger.error("Error in PGN analysis endpoint: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
@@ -480,29 +702,109 @@ def pool_stats():
         stats = engineCommunication.get_pool_stats()
         return jsonify(stats)
     except Exception as e:
-        print(f"Error getting pool stats: {e}")
+        logger.error("Error getting pool stats: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@functools.lru_cache(maxsize=1)
+def _analysis_styles_body():
+    """The /analysis/styles response body; the styles are fixed configuration."""
+    return fastJson.dumps_bytes({"styles": LLMHandler.get_analysis_styles()})
+
+
 @app.route("/analysis/styles", methods=["GET"])
 def analysis_styles():
     """
     Returns available analysis styles.
     """
     try:
-        styles = LLMHandler.get_analysis_styles()
-        return jsonify({"styles": styles})
+        return Response(_analysis_styles_body(), mimetype="application/json")
     except Exception as e:
-        print(f"Error getting analysis styles: {e}")
+        logger.error("Error getting analysis styles: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
 # Live logic
 LIVE_KEY_FEN = "live:fen"
 LIVE_KEY_CONTROLLER = "live:controller"
-LIVE_KEY_LAST_UPDATE = "live:last_update"
 LIVE_KEY_CHAT = "live:chat"
 SESSION_TIMEOUT = 300  # Seconds after which the controller loses its place if inactive
+LIVE_DEFAULT_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+# The controller key expires SESSION_TIMEOUT seconds after the last claim or
+# update, so Redis itself frees the game from an inactive controller.
+# Checking and changing it happens in Lua scripts, atomically, so two users
+# can never both claim the game.
+
+# Claim if free or already ours (refreshing the timeout): KEYS[1] controller,
+# ARGV[1] user id, ARGV[2] timeout
+_CLAIM_LUA = """
+local current = redis.call('GET', KEYS[1])
+if not current or current == ARGV[1] then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Heartbeat, only for the current controller
+_REFRESH_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Release, only by the current controller
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_live_scripts = {}
+
+
+# Set once the keys left by the old controller timeout are gone
+LIVE_KEY_MIGRATED = "live:legacy_dropped"
+
+
+def _drop_stale_live_keys():
+    """
+    Once per database, delete the keys left behind by the timeout check that
+    the controller key's own expiry replaced: live:last_update, which nothing
+    reads any more, and a controller key set without a TTL, which would
+    otherwise hold the game forever.
+    """
+    cache = get_cache().redis_client
+    if not cache:
+        return
+    try:
+        if not cache.set(LIVE_KEY_MIGRATED, 1, nx=True):
+            return
+        cache.delete("live:last_update")
+        if cache.ttl(LIVE_KEY_CONTROLLER) == -1:
+            cache.delete(LIVE_KEY_CONTROLLER)
+            logger.info("Released the live controller key set without a TTL")
+    except Exception as e:
+        logger.warning("Could not drop the stale live keys: %s", e)
+
+
+# In the background so importing the app never waits on Redis
+threading.Thread(
+    target=_drop_stale_live_keys, name="drop-stale-live-keys", daemon=True
+).start()
+
+
+def _run_live_script(cache, source, user_id):
+    """Run one of the controller scripts (registered once) for user_id."""
+    script = _live_scripts.get(source)
+    if script is None:
+        script = _live_scripts[source] = cache.register_script(source)
+    return script(
+        keys=[LIVE_KEY_CONTROLLER], args=[user_id, SESSION_TIMEOUT], client=cache
+    )
 
 
 @app.route("/live/state", methods=["GET"])
@@ -512,33 +814,19 @@ def get_live_state():
     if not cache:
         return jsonify({"error": "Redis not available"}), 500
 
-    current_controller = cache.get(LIVE_KEY_CONTROLLER)
-    last_update = cache.get(LIVE_KEY_LAST_UPDATE)
-
-    # Check timeout
-    is_free = True
-    if current_controller and last_update:
-        if time.time() - float(last_update) < SESSION_TIMEOUT:
-            is_free = False
-        else:
-            # Sessione scaduta
-            cache.delete(LIVE_KEY_CONTROLLER)
-            current_controller = None
-
-    fen = (
-        cache.get(LIVE_KEY_FEN)
-        or "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+    # Single round-trip for the whole state
+    current_controller, fen, raw_chat = cache.mget(
+        LIVE_KEY_CONTROLLER, LIVE_KEY_FEN, LIVE_KEY_CHAT
     )
 
     # Recupera chat history
-    raw_chat = cache.get(LIVE_KEY_CHAT)
-    chat_history = json.loads(raw_chat) if raw_chat else []
+    chat_history = fastJson.loads(raw_chat) if raw_chat else []
 
     return jsonify(
         {
             "controller_id": current_controller,
-            "is_free": is_free,
-            "fen": fen,
+            "is_free": current_controller is None,
+            "fen": fen or LIVE_DEFAULT_FEN,
             "chat": chat_history,
         }
     )
@@ -551,17 +839,9 @@ def claim_controller():
     user_id = data.get("user_id")
 
     cache = get_cache().redis_client
-    current_controller = cache.get(LIVE_KEY_CONTROLLER)
-    last_update = cache.get(LIVE_KEY_LAST_UPDATE)
 
-    # Se è libero o scaduto, o se sei già tu
-    if (
-        not current_controller
-        or (last_update and time.time() - float(last_update) >= SESSION_TIMEOUT)
-        or current_controller == user_id
-    ):
-        cache.set(LIVE_KEY_CONTROLLER, user_id)
-        cache.set(LIVE_KEY_LAST_UPDATE, time.time())
+    # Se è libero (o scaduto), o se sei già tu
+    if user_id and _run_live_script(cache, _CLAIM_LUA, user_id):
         return jsonify({"success": True, "message": "You are now the controller"})
 
     return jsonify(
@@ -578,18 +858,19 @@ def update_live_state():
     chat = data.get("chat")  # Optional list of messages
 
     cache = get_cache().redis_client
-    current_controller = cache.get(LIVE_KEY_CONTROLLER)
 
-    # Solo il controllore può aggiornare
-    if current_controller == user_id:
-        cache.set(LIVE_KEY_LAST_UPDATE, time.time())  # Heartbeat
+    # Solo il controllore può aggiornare (the check is also the heartbeat)
+    if user_id and _run_live_script(cache, _REFRESH_LUA, user_id):
+        if fen or chat is not None:
+            pipe = cache.pipeline(transaction=False)
 
-        if fen:
-            cache.set(LIVE_KEY_FEN, fen)
+            if fen:
+                pipe.set(LIVE_KEY_FEN, fen)
 
-        if chat is not None:
-            cache.set(LIVE_KEY_CHAT, json.dumps(chat))
+            if chat is not None:
+                pipe.set(LIVE_KEY_CHAT, fastJson.dumps(chat))
 
+            pipe.execute()
         return jsonify({"success": True})
 
     return jsonify({"success": False, "error": "Not authorized"}), 403
@@ -605,13 +886,8 @@ def leave_live_state():
     if not cache:
         return jsonify({"error": "Redis not available"}), 500
 
-    current_controller = cache.get(LIVE_KEY_CONTROLLER)
-
     # Only the current controller can leave (release the lock)
-    if current_controller == user_id:
-        cache.delete(LIVE_KEY_CONTROLLER)
-        # We optionally delete last update to ensure it's immediately free
-        cache.delete(LIVE_KEY_LAST_UPDATE)
+    if user_id and _run_live_script(cache, _RELEASE_LUA, user_id):
         return jsonify({"success": True, "message": "You are now a spectator"})
 
     return jsonify({"success": False, "error": "You are not the controller"}), 403
@@ -619,7 +895,11 @@ def leave_live_state():
 
 if __name__ == "__main__":
     # This will only run when called directly (not with gunicorn)
-    logging.basicConfig(level=logging.INFO)
-    load_models()
-    logging.info("Starting development server...")
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+    # The model is already loading in the background (see create_app).
+    # The debugger traces every request, so it is only enabled when DEV is
+    # set; the reloader stays off since its watcher process would import this
+    # module too, starting its own engine pools and model loading
+    debug = bool(os.getenv("DEV"))
+    logger.info("Starting development server (debug=%s)...", debug)
+    app.run(host="0.0.0.0", port=5000, debug=debug, threaded=True, use_reloader=False)
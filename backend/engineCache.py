@@ -15,39 +15,163 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.retry import Retry
+import chess
+import functools
+import hashlib
 import json
 import logging
 import os
+import threading
+import time
 from typing import Dict, List, Optional, Tuple, Any
 
+import fastJson
+from lruCache import LRUCache
+
+try:
+    import zstandard
+except ImportError:  # optional, see requirements.txt
+    zstandard = None
+
+# Lifetime of a cached position, so stale entries don't crowd out hot ones
+CACHE_TTL_SECONDS = int(os.getenv("REDIS_TTL_SECONDS", 7 * 24 * 3600))
+
+# Opt-in: also ignore the halfmove clock in cache keys, trading exactness near
+# the fifty-move rule for more hits on transpositions
+CACHE_IGNORE_CLOCKS = os.getenv("CACHE_IGNORE_CLOCKS", "0") == "1"
+
+# Payloads shorter than this are stored as plain JSON, compressing them saves nothing
+_COMPRESS_MIN_BYTES = 256
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def _encode_payload(analysis: Dict[str, Any]) -> bytes:
+    """Serialize one depth's analysis, zstd-compressed when zstandard is installed."""
+    data = fastJson.dumps_bytes(analysis)
+    if zstandard is not None and len(data) >= _COMPRESS_MIN_BYTES:
+        return zstandard.compress(data, 3)
+    return data
+
+
+def _decode_payload(blob: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Parse a stored payload, or None if it is compressed and zstandard is
+    missing or the compressed data is corrupt (treated as a cache miss).
+    """
+    if blob.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            return None
+        try:
+            blob = zstandard.decompress(blob)
+        except zstandard.ZstdError as e:
+            logging.warning(f"Discarding corrupt cached analysis: {e}")
+            return None
+    return fastJson.loads(blob)
+
+
+# Keys written before they were hashed: "{fen}_{lines}", stored without a TTL.
+# A FEN always holds seven slashes, which no other key in the database has.
+_LEGACY_KEY_PATTERN = "*/*/*/*/*/*/*/*_*"
+# Set once the legacy keys are gone, so only one process per database scans
+_LEGACY_DROPPED_KEY = "cache:legacy_dropped"
+
+# Pick the lowest cached depth >= ARGV[1] and return it with its payload and
+# the key's remaining TTL (ms), so a lookup is a single round-trip that
+# transfers only the chosen analysis
+_PICK_DEPTH_LUA = """
+local best
+for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+    local d = tonumber(field)
+    if d and d >= tonumber(ARGV[1]) and (not best or d < best) then
+        best = d
+    end
+end
+if not best then
+    return false
+end
+return {best, redis.call('HGET', KEYS[1], tostring(best)), redis.call('PTTL', KEYS[1])}
+"""
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_fen(fen: str) -> str:
+    """
+    Canonical FEN used for cache keys.
+
+    The en passant square is kept only when an en passant capture is legal and
+    the fullmove number, which does not affect the analysis, is reset to 1.
+    The halfmove clock is kept since engines scale their score by it, unless
+    CACHE_IGNORE_CLOCKS is set.
+    """
+    try:
+        board = chess.Board(fen)
+    except ValueError:
+        return fen
+    board.fullmove_number = 1
+    if CACHE_IGNORE_CLOCKS:
+        board.halfmove_clock = 0
+    return board.fen(en_passant="legal")
+
 
 class EngineCache:
     """
     Redis-based cache for engine analysis results.
-    Cache key format: {fen}_{lines}
-    Cache value format: {depth: analysis_data}
+    Positions are normalized with _normalize_fen, so transpositions that only
+    differ in move number or in an unusable en passant square share an entry.
+    Cache key format: analysis:{blake2b(normalized fen)}:{lines}
+    Cache value format: hash of depth -> JSON analysis_data (zstd-compressed
+    when zstandard is installed and the payload is large enough)
     """
 
     def __init__(self, host=None, port=None, db=0):
         """Initialize Redis connection."""
+        # (expiry, {depth: analysis}) of recently used keys, holding the depths
+        # fetched or stored by this process until their Redis key expires
+        self._local = LRUCache(maxsize=int(os.getenv("ENGINE_CACHE_LOCAL_SIZE", 4096)))
+
         # Use environment variables if available, otherwise defaults
         if host is None:
             host = os.getenv("REDIS_HOST", "redis")
         if port is None:
             port = int(os.getenv("REDIS_PORT", 6379))
 
+        # Binary connection for the analysis payloads, which may be compressed
+        self._blob_client = None
+
+        # Redis is best-effort: short timeouts and a couple of quick retries,
+        # so a hiccup turns into a cache miss instead of a stalled request
+        connection_kwargs = dict(
+            host=host,
+            port=port,
+            db=db,
+            max_connections=int(os.getenv("REDIS_MAX_CONNECTIONS", 64)),
+            socket_connect_timeout=1,
+            socket_timeout=1,
+            retry_on_timeout=True,
+            retry=Retry(ExponentialBackoff(cap=0.2, base=0.02), 2),
+            health_check_interval=30,
+        )
+
         try:
             self.redis_client = redis.Redis(
-                host=host,
-                port=port,
-                db=db,
-                decode_responses=True,
-                socket_connect_timeout=5,
-                socket_timeout=5,
+                connection_pool=redis.ConnectionPool(
+                    decode_responses=True, **connection_kwargs
+                )
             )
             # Test connection
             self.redis_client.ping()
+            self._blob_client = redis.Redis(
+                connection_pool=redis.ConnectionPool(**connection_kwargs)
+            )
+            self._pick_depth_script = self._blob_client.register_script(
+                _PICK_DEPTH_LUA
+            )
             logging.info(f"Connected to Redis at {host}:{port}")
+            threading.Thread(
+                target=self._drop_legacy_keys, name="drop-legacy-cache-keys", daemon=True
+            ).start()
         except redis.ConnectionError as e:
             logging.warning(f"Could not connect to Redis: {e}")
             self.redis_client = None
@@ -55,9 +179,60 @@ class EngineCache:
             logging.warning(f"Redis connection error: {e}")
             self.redis_client = None
 
+    def _drop_legacy_keys(self):
+        """
+        Unlink the "{fen}_{lines}" keys of the old key format, once per
+        database. They are never read again and, having no TTL, would
+        otherwise stay forever.
+        """
+        dropped = 0
+        try:
+            if not self.redis_client.set(_LEGACY_DROPPED_KEY, 1, nx=True):
+                return
+            batch = []
+            for key in self.redis_client.scan_iter(match=_LEGACY_KEY_PATTERN, count=1000):
+                batch.append(key)
+                if len(batch) >= 500:
+                    dropped += self.redis_client.unlink(*batch)
+                    batch.clear()
+            if batch:
+                dropped += self.redis_client.unlink(*batch)
+        except redis.RedisError as e:
+            logging.warning(f"Could not drop legacy cache keys: {e}")
+            try:  # let the next process start try again
+                self.redis_client.delete(_LEGACY_DROPPED_KEY)
+            except redis.RedisError:
+                pass
+        if dropped:
+            logging.info(f"Dropped {dropped} legacy cache keys")
+
     def _create_cache_key(self, fen: str, lines: int) -> str:
-        """Create cache key from FEN and lines."""
-        return f"{fen}_{lines}"
+        """Create cache key from FEN and lines, hashing the FEN to a fixed 32-char digest."""
+        digest = hashlib.blake2b(_normalize_fen(fen).encode(), digest_size=16).hexdigest()
+        return f"analysis:{digest}:{lines}"
+
+    def _local_get(self, cache_key: str) -> Optional[Dict[str, Any]]:
+        """Depth analyses of cache_key held locally, or None if missing or expired."""
+        entry = self._local.get(cache_key)
+        if entry is None:
+            return None
+        expires_at, depth_analysis = entry
+        if time.monotonic() >= expires_at:
+            self._local.pop(cache_key)
+            return None
+        return depth_analysis
+
+    def _local_put(self, cache_key: str, depth_analysis: Dict[str, Any], ttl_ms: int):
+        """Hold depth_analysis locally for as long as the Redis key lives (ttl_ms)."""
+        if ttl_ms <= 0:  # no expiry set on the Redis side
+            ttl_ms = CACHE_TTL_SECONDS * 1000
+        self._local.put(cache_key, (time.monotonic() + ttl_ms / 1000, depth_analysis))
+
+    @staticmethod
+    def _pick_depth(depths, depth: int) -> Optional[int]:
+        """Return the lowest cached depth that is >= the requested one, if any."""
+        suitable_depths = [int(d) for d in depths if int(d) >= depth]
+        return min(suitable_depths) if suitable_depths else None
 
     def get_cached_analysis(
         self, fen: str, depth: int, lines: int
@@ -65,6 +240,10 @@ class EngineCache:
         """
         Get cached analysis if available and depth is sufficient.
 
+        Analyses already fetched are kept in a local LRU so repeated lookups of
+        the same position skip Redis and the JSON decode. Otherwise a script
+        picks the depth on the Redis side and returns only that payload.
+
         Args:
             fen: Chess position in FEN notation
             depth: Requested analysis depth
@@ -78,31 +257,29 @@ class EngineCache:
 
         try:
             cache_key = self._create_cache_key(fen, lines)
-            cached_data = self.redis_client.get(cache_key)
-
-            if not cached_data:
-                logging.debug(f"Cache miss for key: {cache_key}")
-                return None
-
-            # Parse cached data
-            depth_analysis = json.loads(cached_data)
-
-            # Find the highest depth that is >= requested depth
-            available_depths = [int(d) for d in depth_analysis.keys()]
-            suitable_depths = [d for d in available_depths if d >= depth]
 
-            if not suitable_depths:
-                logging.debug(
-                    f"No suitable depth found in cache. Requested: {depth}, Available: {available_depths}"
+            depth_analysis = self._local_get(cache_key)
+            best_depth = (
+                self._pick_depth(depth_analysis, depth) if depth_analysis else None
+            )
+            if best_depth is None:
+                picked = self._pick_depth_script(
+                    keys=[cache_key], args=[depth], client=self._blob_client
                 )
-                return None
+                analysis = _decode_payload(picked[1]) if picked else None
+                if analysis is None:
+                    logging.debug("Cache miss for key: %s (depth %s)", cache_key, depth)
+                    return None
+
+                best_depth = int(picked[0])
+                depth_analysis = dict(depth_analysis or {})
+                depth_analysis[str(best_depth)] = analysis
+                self._local_put(cache_key, depth_analysis, int(picked[2]))
 
-            # Use the lowest suitable depth (most efficient)
-            best_depth = min(suitable_depths)
             analysis = depth_analysis[str(best_depth)]
 
             logging.info(
-                f"Cache hit for {cache_key} at depth {best_depth} (requested: {depth})"
+                "Cache hit for %s at depth %s (requested: %s)", cache_key, best_depth, depth
             )
             return analysis["bestmoves"], analysis["ponder"]
 
@@ -110,12 +287,89 @@ class EngineCache:
             logging.warning(f"Error retrieving from cache: {e}")
             return None
 
+    def has_sufficient_depth(self, fen: str, depth: int, lines: int) -> bool:
+        """
+        Whether an analysis of at least the requested depth is cached, checked
+        on the depth field names only, without transferring any payload.
+        """
+        if not self.redis_client:
+            return False
+
+        try:
+            cache_key = self._create_cache_key(fen, lines)
+            depth_analysis = self._local_get(cache_key)
+            if depth_analysis and self._pick_depth(depth_analysis, depth) is not None:
+                return True
+            depths = self._blob_client.hkeys(cache_key)
+            return self._pick_depth(depths, depth) is not None
+        except redis.RedisError as e:
+            logging.warning(f"Error checking cache: {e}")
+            return False
+
+    def get_cached_batch(
+        self, fens: List[str], depth: int, lines: int
+    ) -> Dict[str, Tuple[List[Dict], Any]]:
+        """
+        Look up many positions at once, e.g. all the positions of a game.
+
+        Positions missing from the local LRU are all resolved in one pipelined
+        round-trip of the depth-picking script.
+
+        Returns:
+            Dict mapping each FEN with a sufficiently deep cached analysis to
+            its (bestmoves, ponder) tuple
+        """
+        if not self.redis_client:
+            return {}
+
+        hits = {}
+        try:
+            pending = {}  # cache_key -> FENs sharing it
+            for fen in fens:
+                cache_key = self._create_cache_key(fen, lines)
+                depth_analysis = self._local_get(cache_key)
+                best_depth = (
+                    self._pick_depth(depth_analysis, depth) if depth_analysis else None
+                )
+                if best_depth is None:
+                    pending.setdefault(cache_key, []).append(fen)
+                else:
+                    analysis = depth_analysis[str(best_depth)]
+                    hits[fen] = analysis["bestmoves"], analysis["ponder"]
+
+            if not pending:
+                return hits
+
+            pipe = self._blob_client.pipeline(transaction=False)
+            for cache_key in pending:
+                self._pick_depth_script(keys=[cache_key], args=[depth], client=pipe)
+
+            for cache_key, picked in zip(pending, pipe.execute()):
+                analysis = _decode_payload(picked[1]) if picked else None
+                if analysis is None:
+                    continue
+                depth_analysis = dict(self._local_get(cache_key) or {})
+                depth_analysis[str(int(picked[0]))] = analysis
+                self._local_put(cache_key, depth_analysis, int(picked[2]))
+                for fen in pending[cache_key]:
+                    hits[fen] = analysis["bestmoves"], analysis["ponder"]
+
+            logging.info(
+                "Batch cache lookup: %d/%d positions cached", len(hits), len(fens)
+            )
+        except (json.JSONDecodeError, KeyError, redis.RedisError) as e:
+            logging.warning(f"Error retrieving batch from cache: {e}")
+        return hits
+
     def store_analysis(
         self, fen: str, depth: int, lines: int, bestmoves: List[Dict], ponder: Any
     ):
         """
         Store analysis result in cache.
 
+        Each depth is its own hash field, so a store is a single HSET that
+        neither reads nor re-encodes the depths already cached.
+
         Args:
             fen: Chess position in FEN notation
             depth: Analysis depth used
@@ -128,23 +382,21 @@ class EngineCache:
 
         try:
             cache_key = self._create_cache_key(fen, lines)
+            analysis = {"bestmoves": bestmoves, "ponder": ponder}
 
-            # Get existing cached data or create new
-            existing_data = self.redis_client.get(cache_key)
-            if existing_data:
-                depth_analysis = json.loads(existing_data)
-            else:
-                depth_analysis = {}
-
-            # Store/update analysis for this depth
-            depth_analysis[str(depth)] = {"bestmoves": bestmoves, "ponder": ponder}
+            # Store with expiration (1 week by default), refreshed on every store
+            pipe = self._blob_client.pipeline(transaction=False)
+            pipe.hset(cache_key, str(depth), _encode_payload(analysis))
+            pipe.expire(cache_key, CACHE_TTL_SECONDS)
+            pipe.execute()
 
-            # Store back to Redis with expiration (1 week)
-            self.redis_client.set(cache_key, json.dumps(depth_analysis))
+            depth_analysis = dict(self._local_get(cache_key) or {})
+            depth_analysis[str(depth)] = analysis
+            self._local_put(cache_key, depth_analysis, CACHE_TTL_SECONDS * 1000)
 
             logging.info(f"Stored analysis in cache: {cache_key} at depth {depth}")
 
-        except (json.JSONDecodeError, redis.RedisError) as e:
+        except redis.RedisError as e:
             logging.warning(f"Error storing to cache: {e}")
 
     def clear_cache(self):
@@ -154,6 +406,7 @@ class EngineCache:
 
         try:
             self.redis_client.flushdb()
+            self._local.clear()
             logging.info("Cache cleared")
         except redis.RedisError as e:
             logging.warning(f"Error clearing cache: {e}")
@@ -179,11 +432,14 @@ class EngineCache:
 
 # Global cache instance
 _cache_instance = None
+_cache_instance_lock = threading.Lock()
 
 
 def get_cache() -> EngineCache:
-    """Get or create global cache instance."""
+    """Get or create global cache instance (thread-safe)."""
     global _cache_instance
     if _cache_instance is None:
-        _cache_instance = EngineCache()
+        with _cache_instance_lock:
+            if _cache_instance is None:
+                _cache_instance = EngineCache()
     return _cache_instance
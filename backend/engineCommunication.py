@@ -16,7 +16,10 @@
 
 
 import subprocess
+import itertools
 import os
+import sys
+import selectors
 import chess
 import chess.pgn
 import logging
@@ -24,6 +27,8 @@ import threading
 import queue
 import time
 import atexit
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
 
 # import sys
 from engineCache import get_cache
@@ -31,22 +36,73 @@ from engineCache import get_cache
 # import os
 
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
 engine_name_NNUE = "shashchess"
 engine_name_HUMAN = "alexander"
-engine_path_NNUE = (
-    f".\\executables\\{engine_name_NNUE}.exe"
-    if os.name == "nt"
-    else f"./executables/{engine_name_NNUE}"
-)
-engine_path_HUMAN = (
-    f".\\executables\\{engine_name_HUMAN}.exe"
-    if os.name == "nt"
-    else f"./executables/{engine_name_HUMAN}"
-)
+# Resolved once, next to this module, so engines start regardless of the
+# working directory and without a lookup by the OS
+_engine_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "executables")
+_engine_ext = ".exe" if os.name == "nt" else ""
+engine_path_NNUE = os.path.join(_engine_dir, engine_name_NNUE + _engine_ext)
+engine_path_HUMAN = os.path.join(_engine_dir, engine_name_HUMAN + _engine_ext)
 
 POOL_SIZE = int(os.environ.get("ENGINE_POOL_SIZE", 4))
 MAX_THREADS_TO_USE = int(os.environ.get("MAX_ENGINE_THREADS", 8))
+# Transposition table size of each engine. Engines don't share it, so for
+# correlated positions (games, engines()' follow-ups) a smaller pool with a
+# larger hash can beat many small ones
+HASH_MB = int(os.environ.get("ENGINE_HASH_MB", 64))
+
+
+class _EngineOutput:
+    """
+    Line reader over an engine's stdout pipe. Waits for data with a selector
+    instead of polling, and buffers the raw bytes so that only complete lines
+    are returned even though the pipe is non-blocking.
+    """
+
+    def __init__(self, stdout):
+        self.fd = stdout.fileno()
+        os.set_blocking(self.fd, False)
+        self.buffer = bytearray()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.fd, selectors.EVENT_READ)
+
+    def readline(self, deadline):
+        """
+        Return the next line (stripped), or None if none arrived before
+        deadline (a time.monotonic() value). Raises EOFError if the engine
+        closed its output.
+        """
+        while True:
+            end = self.buffer.find(b"\n")
+            if end >= 0:
+                line = self.buffer[:end].decode(errors="replace").strip()
+                del self.buffer[: end + 1]
+                return line
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.selector.select(remaining):
+                return None
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                raise EOFError("Engine closed its output")
+            self.buffer += chunk
+
+    def close(self):
+        self.selector.close()
+
+
+def _send(engine, commands):
+    """
+    Write UCI commands straight to the engine's stdin pipe: one system call,
+    without going through the text and buffered layers of engine.stdin.
+    """
+    data = commands.encode()
+    fd = engine.stdin.fileno()
+    while data:
+        data = data[os.write(fd, data):]
 
 
 class EnginePool:
@@ -57,14 +113,15 @@ class EnginePool:
     def __init__(self, engine_path, pool_size=POOL_SIZE):
         self.engine_path = engine_path
         self.pool_size = pool_size
-        self.available_engines = queue.Queue()
+        # C-implemented FIFO: put/get take no Python-level lock
+        self.available_engines = queue.SimpleQueue()
         self.lock = threading.Lock()
         self.shutdown = False
         self._initialize_pool()
 
     def _initialize_pool(self):
         """Initialize all engines in the pool."""
-        logging.info(
+        logger.info(
             f"Initializing engine pool with {self.pool_size} engines for {self.engine_path}"
         )
         for i in range(self.pool_size):
@@ -72,48 +129,49 @@ class EnginePool:
                 engine = self._create_engine()
                 if engine:
                     self.available_engines.put(engine)
-                    logging.info(
+                    logger.info(
                         f"Engine {i+1}/{self.pool_size} initialized successfully"
                     )
             except Exception as e:
-                logging.error(f"Failed to initialize engine {i+1}: {e}")
+                logger.error(f"Failed to initialize engine {i+1}: {e}")
 
     def _create_engine(self):
         """Create and initialize a single engine."""
         try:
-            logging.info(f"Creating new engine instance from {self.engine_path}")
+            logger.info(f"Creating new engine instance from {self.engine_path}")
             engine = subprocess.Popen(
                 [self.engine_path],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                universal_newlines=True,
+                stderr=subprocess.DEVNULL,
             )
             if engine.stdin is None or engine.stdout is None:
                 raise RuntimeError("Engine stdin or stdout is None")
 
-            os.set_blocking(engine.stdout.fileno(), False)
-
-            # Initialize UCI protocol
-            engine.stdin.write("uci\n")
-            engine.stdin.flush()
-
-            # engine.stdin.write("setoption name Threads value 64\n")
-            engine.stdin.write(f"setoption name Threads value {MAX_THREADS_TO_USE}\n")
-            engine.stdin.flush()
-            engine.stdin.write("setoption name Hash value 64\n")
-            engine.stdin.flush()
-            engine.stdin.write("setoption name UCI_ShowWDL value true\n")
-            engine.stdin.flush()
-
-            # Send isready and wait for readyok
-            engine.stdin.write("isready\n")
-            engine.stdin.flush()
+            engine.output = _EngineOutput(engine.stdout)
+            # Whether a search may still be printing (see return_engine)
+            engine.searching = False
+            # Whether the warm-up search's output is still to be read
+            engine.warming = True
+
+            # Initialize UCI protocol and options in a single write, then a
+            # depth 1 warm-up search, so the engine loads its network while
+            # it waits in the pool rather than during the first analysis
+            _send(
+                engine,
+                "uci\n"
+                f"setoption name Threads value {MAX_THREADS_TO_USE}\n"
+                f"setoption name Hash value {HASH_MB}\n"
+                "setoption name UCI_ShowWDL value true\n"
+                "isready\n"
+                "position startpos\n"
+                "go depth 1\n",
+            )
 
             return engine
 
         except Exception as e:
-            logging.error(f"Failed to create engine: {e}")
+            logger.error(f"Failed to create engine: {e}")
             return None
 
     def get_engine(self, timeout=30):
@@ -126,13 +184,38 @@ class EnginePool:
             # Test if engine is still alive
             if engine.poll() is not None:
                 # Engine died, create a new one
-                logging.warning("Engine died, creating replacement")
-                new_engine = self._create_engine()
-                return new_engine if new_engine else None
-            return engine
+                logger.warning("Engine died, creating replacement")
+                self._cleanup_engine(engine)
+                engine = self._create_engine()
         except queue.Empty:
-            logging.warning("No engines available in pool, creating temporary engine")
-            return self._create_engine()
+            logger.warning("No engines available in pool, creating temporary engine")
+            engine = self._create_engine()
+
+        if engine is not None and engine.warming and not self._finish_warmup(engine):
+            self._cleanup_engine(engine)
+            return None
+        return engine
+
+    def _finish_warmup(self, engine, timeout=30):
+        """
+        Read the start-up output up to the warm-up search's bestmove, so the
+        first analysis starts on a clean stream. Usually already printed by
+        the time the engine is first used. Returns False if the engine did
+        not finish in time.
+        """
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                output = engine.output.readline(deadline)
+                if output is None:
+                    logger.warning("Engine warm-up timeout")
+                    return False
+                if output.startswith("bestmove"):
+                    engine.warming = False
+                    return True
+        except Exception as e:
+            logger.error("Engine warm-up failed: %s", e)
+            return False
 
     def return_engine(self, engine):
         """Return an engine to the pool."""
@@ -141,35 +224,42 @@ class EnginePool:
             self._cleanup_engine(engine)
             return
 
+        # A search that ended with its bestmove leaves nothing unread, and
+        # the hash table is kept for the next analysis
+        if not engine.searching:
+            self.available_engines.put(engine)
+            return
+
         try:
-            # Reset engine state
-            engine.stdin.write("ucinewgame\n")
-            engine.stdin.flush()
-            engine.stdin.write("isready\n")
-            engine.stdin.flush()
+            # The search was stopped or failed: its late output precedes the
+            # readyok, so waiting for it leaves the engine in sync
+            _send(engine, "stop\nisready\n")
 
             # Wait for readyok with timeout
-            start_time = time.time()
-            while time.time() - start_time < 5:
-                output = engine.stdout.readline().strip()
+            deadline = time.monotonic() + 5
+            while True:
+                output = engine.output.readline(deadline)
+                if output is None:
+                    break
                 if output == "readyok":
+                    engine.searching = False
                     self.available_engines.put(engine)
                     return
 
             # Timeout - engine is unresponsive
-            logging.warning("Engine unresponsive, discarding")
+            logger.warning("Engine unresponsive, discarding")
             self._cleanup_engine(engine)
 
         except Exception as e:
-            logging.error(f"Error returning engine to pool: {e}")
+            logger.error(f"Error returning engine to pool: {e}")
             self._cleanup_engine(engine)
 
     def _cleanup_engine(self, engine):
         """Safely cleanup an engine."""
+        engine.output.close()
         try:
             if engine.poll() is None:
-                engine.stdin.write("quit\n")
-                engine.stdin.flush()
+                _send(engine, "quit\n")
                 engine.wait(timeout=5)
         except Exception:
             try:
@@ -181,7 +271,7 @@ class EnginePool:
     def shutdown_pool(self):
         """Shutdown all engines in the pool."""
         self.shutdown = True
-        logging.info("Shutting down engine pool")
+        logger.info("Shutting down engine pool")
 
         engines_to_cleanup = []
         while not self.available_engines.empty():
@@ -199,18 +289,21 @@ class EnginePool:
 _nnue_pool = None
 _human_pool = None
 _pool_lock = threading.Lock()
+# Initialized pools by engine path, read without taking _pool_lock
+_pools = {}
 
 
 def _initialize_nnue_pool():
     """Initialize NNUE engine pool at startup."""
     global _nnue_pool
 
-    logging.info("Initializing NNUE engine pool at startup...")
+    logger.info("Initializing NNUE engine pool at startup...")
     try:
         _nnue_pool = EnginePool(engine_path_NNUE, pool_size=POOL_SIZE)
-        logging.info("NNUE engine pool initialized successfully at startup")
+        _pools[engine_path_NNUE] = _nnue_pool
+        logger.info("NNUE engine pool initialized successfully at startup")
     except Exception as e:
-        logging.error(f"Failed to initialize NNUE engine pool at startup: {e}")
+        logger.error(f"Failed to initialize NNUE engine pool at startup: {e}")
         _nnue_pool = None
 
 
@@ -218,47 +311,67 @@ def _get_engine_pool(engine_path):
     """Get or create engine pool for the given path."""
     global _nnue_pool, _human_pool
 
+    pool = _pools.get(engine_path)
+    if pool is not None:
+        return pool
+
     with _pool_lock:
         if engine_path == engine_path_NNUE:
             if _nnue_pool is None:
-                logging.warning("NNUE pool not initialized at startup, creating now...")
+                logger.warning("NNUE pool not initialized at startup, creating now...")
                 _nnue_pool = EnginePool(engine_path, pool_size=POOL_SIZE)
+                _pools[engine_path] = _nnue_pool
             return _nnue_pool
         elif engine_path == engine_path_HUMAN:
             if _human_pool is None:
-                logging.info("Lazy initializing HUMAN engine pool...")
+                logger.info("Lazy initializing HUMAN engine pool...")
                 _human_pool = EnginePool(engine_path, pool_size=POOL_SIZE)
+                _pools[engine_path] = _human_pool
             return _human_pool
         else:
-            # For other engine paths, create a temporary pool
-            return EnginePool(engine_path, pool_size=8)
+            # Other engine paths get a pool too, kept for the next calls
+            # and shut down on exit like the built-in ones
+            logger.info(f"Initializing engine pool for {engine_path}...")
+            pool = _pools[engine_path] = EnginePool(engine_path, pool_size=POOL_SIZE)
+            return pool
 
 
 def _cleanup_pools():
     """Cleanup function called on exit."""
-    global _nnue_pool, _human_pool
-    if _nnue_pool:
-        _nnue_pool.shutdown_pool()
-    if _human_pool:
-        _human_pool.shutdown_pool()
+    if _engine_executor:
+        _engine_executor.shutdown(wait=False, cancel_futures=True)
+    if _prefetch_executor:
+        _prefetch_executor.shutdown(wait=False, cancel_futures=True)
+    for pool in list(_pools.values()):
+        pool.shutdown_pool()
 
 
 # Register cleanup function
 atexit.register(_cleanup_pools)
 
-# Initialize NNUE engine pool at startup (HUMAN pool is lazy-loaded)
+# Initialize NNUE engine pool at startup; the HUMAN pool is started in the
+# background, so the first HUMAN request doesn't pay for it (disable with
+# ENGINE_PREWARM_HUMAN=0 to keep it lazy)
 _initialize_nnue_pool()
+if os.environ.get("ENGINE_PREWARM_HUMAN", "1") != "0":
+    threading.Thread(
+        target=_get_engine_pool,
+        args=(engine_path_HUMAN,),
+        name="human-pool-prewarm",
+        daemon=True,
+    ).start()
 
 
 def get_pool_stats():
     """Get statistics about the engine pools."""
     stats = {}
     if _nnue_pool:
+        nnue_available = _nnue_pool.available_engines.qsize()
         stats["NNUE"] = {
             "initialized": True,
             "pool_size": _nnue_pool.pool_size,
-            "available": _nnue_pool.available_engines.qsize(),
-            "busy": _nnue_pool.pool_size - _nnue_pool.available_engines.qsize(),
+            "available": nnue_available,
+            "busy": _nnue_pool.pool_size - nnue_available,
         }
     else:
         stats["NNUE"] = {
@@ -267,11 +380,12 @@ def get_pool_stats():
         }
 
     if _human_pool:
+        human_available = _human_pool.available_engines.qsize()
         stats["HUMAN"] = {
             "initialized": True,
             "pool_size": _human_pool.pool_size,
-            "available": _human_pool.available_engines.qsize(),
-            "busy": _human_pool.pool_size - _human_pool.available_engines.qsize(),
+            "available": human_available,
+            "busy": _human_pool.pool_size - human_available,
         }
     else:
         stats["HUMAN"] = {
@@ -281,9 +395,17 @@ def get_pool_stats():
     return stats
 
 
+# Analyses in progress by (engine_path, fen, depth, lines), so concurrent
+# requests for the same analysis wait for a single engine search
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
 def call_engine(fen, depth, engine_path=engine_path_NNUE, lines=3):
     """
     Call chess engine for analysis with Redis caching and engine pooling.
+    Identical concurrent requests share a single search, whose result is
+    returned to all of them and must not be mutated.
 
     Args:
         fen: Chess position in FEN notation
@@ -294,6 +416,125 @@ def call_engine(fen, depth, engine_path=engine_path_NNUE, lines=3):
     Returns:
         Tuple of (bestmoves, ponder)
     """
+    key = (engine_path, fen, depth, lines)
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+
+    try:
+        result = _call_engine_uncached(fen, depth, engine_path, lines)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+
+# Threads running engine searches for acall_engine and engines(). A search
+# mostly waits on the engine's pipes, so threads suffice; sized to keep both
+# pools busy.
+_engine_executor = None
+_engine_executor_lock = threading.Lock()
+
+
+def _get_engine_executor():
+    global _engine_executor
+    with _engine_executor_lock:
+        if _engine_executor is None:
+            _engine_executor = ThreadPoolExecutor(
+                max_workers=2 * POOL_SIZE, thread_name_prefix="engine"
+            )
+        return _engine_executor
+
+
+async def acall_engine(fen, depth, engine_path=engine_path_NNUE, lines=3):
+    """
+    Async variant of call_engine, for ASGI hosts: the search runs on a
+    bounded thread pool, so the event loop keeps serving other requests.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_engine_executor(), call_engine, fen, depth, engine_path, lines
+    )
+
+
+# Background analysis of the position expected after the best move and the
+# engine's predicted reply (its ponder move), at most one search at a time
+PREFETCH_ENABLED = os.environ.get("ENGINE_PREFETCH", "1") != "0"
+_PREFETCH_MAX_PENDING = 2
+_prefetch_executor = None
+_prefetch_pending = set()
+_prefetch_lock = threading.Lock()
+
+
+def _idle_engine_available(engine_path):
+    """Whether an already initialized pool for engine_path has an idle engine."""
+    if engine_path == engine_path_NNUE:
+        pool = _nnue_pool
+    elif engine_path == engine_path_HUMAN:
+        pool = _human_pool
+    else:
+        return False
+    return pool is not None and not pool.available_engines.empty()
+
+
+def prefetch_reply_position(fen, bestmoves, ponder, depth, engine_path=engine_path_NNUE, lines=3):
+    """
+    Analyze, in the background, the position reached after the best move and
+    the ponder reply, so a request for it once those moves are played hits
+    the cache. Skipped whenever no pooled engine is idle, so prefetching never
+    holds up a request.
+    """
+    if not PREFETCH_ENABLED or not bestmoves or not ponder or not bestmoves[0]["move"]:
+        return
+
+    try:
+        board = chess.Board(fen)
+        for move_uci in (bestmoves[0]["move"], ponder):
+            move = chess.Move.from_uci(move_uci)
+            if move not in board.legal_moves:
+                return
+            board.push(move)
+    except ValueError:
+        return
+    key = (engine_path, board.fen(), depth, lines)
+
+    if not _idle_engine_available(engine_path):
+        return
+
+    global _prefetch_executor
+    with _prefetch_lock:
+        if key in _prefetch_pending or len(_prefetch_pending) >= _PREFETCH_MAX_PENDING:
+            return
+        _prefetch_pending.add(key)
+        if _prefetch_executor is None:
+            _prefetch_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="engine-prefetch"
+            )
+        _prefetch_executor.submit(_prefetch, key)
+
+
+def _prefetch(key):
+    engine_path, fen, depth, lines = key
+    try:
+        # Requests may have taken the idle engines since it was scheduled
+        if _idle_engine_available(engine_path):
+            call_engine(fen, depth, engine_path, lines)
+    except Exception as e:
+        logger.warning("Prefetch analysis of %s failed: %s", fen, e)
+    finally:
+        with _prefetch_lock:
+            _prefetch_pending.discard(key)
+
+
+def _call_engine_uncached(fen, depth, engine_path, lines):
     # Get cache instance
     cache = get_cache()
 
@@ -303,8 +544,8 @@ def call_engine(fen, depth, engine_path=engine_path_NNUE, lines=3):
         return cached_result
 
     # Cache miss - compute analysis using engine pool
-    logging.info(
-        f"Computing engine analysis for FEN: {fen}, depth: {depth}, lines: {lines}"
+    logger.info(
+        "Computing engine analysis for FEN: %s, depth: %s, lines: %s", fen, depth, lines
     )
 
     # Get engine from pool
@@ -312,30 +553,25 @@ def call_engine(fen, depth, engine_path=engine_path_NNUE, lines=3):
     engine = pool.get_engine()
 
     if engine is None:
-        logging.error("Failed to get engine from pool")
+        logger.error("Failed to get engine from pool")
         return [], None
     elif engine.stdin is None or engine.stdout is None:
-        logging.error("Engine stdin or stdout is None")
+        logger.error("Engine stdin or stdout is None")
         return [], None
 
     try:
-        # Set MultiPV option for this analysis
-        engine.stdin.write(f"setoption name MultiPV value {lines}\n")
-        engine.stdin.flush()
-        engine.stdin.write("isready\n")
-        engine.stdin.flush()
-
         # Use the unified analysis function
         result = _analyze_position_with_engine(engine, fen, depth, lines)
 
-        # Store result in cache
-        if result[0]:  # Only cache if we got valid results
+        # Only cache complete searches: one still marked as searching timed
+        # out or failed before reaching depth
+        if result[0] and not engine.searching:
             cache.store_analysis(fen, depth, lines, result[0], result[1])
 
         return result
 
     except Exception as e:
-        logging.error(f"Error during engine analysis: {e}")
+        logger.error(f"Error during engine analysis: {e}")
         return [], None
 
     finally:
@@ -343,10 +579,19 @@ def call_engine(fen, depth, engine_path=engine_path_NNUE, lines=3):
         pool.return_engine(engine)
 
 
+# Buffered game analyses in progress by (moves, depth, lines, engine_path), so
+# an identical request (e.g. a client retry) waits for the running analysis
+_game_inflight = {}
+_game_inflight_lock = threading.Lock()
+
+
 def analyze_pgn_game(pgn_moves, depth=15, lines=3, engine_path=engine_path_NNUE):
     """
-    Analyze a complete PGN game using a dedicated engine instance.
-    More efficient for game analysis as the engine can reuse hash table entries.
+    Analyze a complete PGN game. Positions missing from the cache are
+    searched on pooled engines, several at once when the pool is large
+    enough (see _pgn_parallelism); engines without a pool get a dedicated
+    one for the game. Identical concurrent requests share a single analysis,
+    whose result is returned to all of them and must not be mutated.
 
     Args:
         pgn_moves: List of moves in PGN format or PGN string
@@ -357,10 +602,45 @@ def analyze_pgn_game(pgn_moves, depth=15, lines=3, engine_path=engine_path_NNUE)
     Returns:
         List of analysis results for each position
     """
-    import chess.pgn
-    import io
+    moves = _parse_game_moves(pgn_moves)
+    key = (tuple(moves), depth, lines, engine_path)
+
+    with _game_inflight_lock:
+        future = _game_inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _game_inflight[key] = Future()
+    if not owner:
+        logger.info("Joining the PGN analysis already in progress for this game")
+        return future.result()
 
-    logging.info(f"Starting PGN game analysis with depth {depth}, lines {lines}")
+    try:
+        result = list(_iter_game_positions(moves, depth, lines, engine_path))
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _game_inflight_lock:
+            del _game_inflight[key]
+
+
+def iter_analyze_pgn_game(pgn_moves, depth=15, lines=3, engine_path=engine_path_NNUE):
+    """
+    Like analyze_pgn_game, but returns an iterator yielding the analysis of
+    each position as soon as it is ready. pgn_moves is validated right away
+    (raising ValueError); the searches start when iteration begins and
+    are abandoned when it ends or the iterator is closed.
+    """
+    return _iter_game_positions(
+        _parse_game_moves(pgn_moves), depth, lines, engine_path
+    )
+
+
+def _parse_game_moves(pgn_moves):
+    """Return the UCI moves of a PGN string or list of moves, raising ValueError if invalid."""
+    import io
 
     # Parse PGN moves
     if isinstance(pgn_moves, str):
@@ -369,106 +649,163 @@ def analyze_pgn_game(pgn_moves, depth=15, lines=3, engine_path=engine_path_NNUE)
         game = chess.pgn.read_game(pgn_io)
         if game is None:
             raise ValueError("Invalid PGN format")
-        moves = [move.uci() for move in game.mainline_moves()]
+        return [move.uci() for move in game.mainline_moves()]
     elif isinstance(pgn_moves, list):
         # If it's a list of moves, use directly
-        moves = pgn_moves
+        return pgn_moves
     else:
         raise ValueError("pgn_moves must be a PGN string or list of moves")
 
-    # Create dedicated engine with optimized settings
-    engine = None
-    try:
-        logging.info(f"Creating dedicated engine for PGN analysis: {engine_path}")
-        engine = subprocess.Popen(
-            [engine_path],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-        )
 
-        if engine.stdin is None or engine.stdout is None:
-            raise RuntimeError("Engine stdin or stdout is None")
+def _start_game_engine(engine_path, lines):
+    """Start a dedicated engine configured for analysing a whole game."""
+    logger.info(f"Creating dedicated engine for PGN analysis: {engine_path}")
+    engine = subprocess.Popen(
+        [engine_path],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+    )
 
-        # Initialize UCI protocol
-        engine.stdin.write("uci\n")
-        engine.stdin.flush()
+    if engine.stdin is None or engine.stdout is None:
+        raise RuntimeError("Engine stdin or stdout is None")
+    engine.output = _EngineOutput(engine.stdout)
+
+    # Initialize UCI protocol with optimized options for game analysis, in
+    # a single write
+    _send(
+        engine,
+        "uci\n"
+        f"setoption name Threads value {MAX_THREADS_TO_USE}\n"
+        f"setoption name Hash value {HASH_MB}\n"
+        f"setoption name MultiPV value {lines}\n"
+        "isready\n",
+    )
+    return engine
 
-        # Set optimized options for game analysis
-        engine.stdin.write(f"setoption name Threads value {MAX_THREADS_TO_USE}\n")
-        engine.stdin.flush()
-        engine.stdin.write("setoption name Hash value 64\n")
-        engine.stdin.flush()
-        engine.stdin.write(f"setoption name MultiPV value {lines}\n")
-        engine.stdin.flush()
 
-        # Send isready and wait for readyok
-        engine.stdin.write("isready\n")
-        engine.stdin.flush()
+def _game_positions(moves):
+    """
+    Replay moves from the starting position.
 
-        # Analyze each position in the game
-        board = chess.Board()
-        analysis_results = []
-        cache = get_cache()
+    Returns:
+        List of (move_number, fen, move_played) for the starting position and
+        each legal move; illegal or malformed moves are logged and skipped
+    """
+    board = chess.Board()
+    positions = [(0, board.fen(), None)]
+    for move_num, move_uci in enumerate(moves, 1):
+        try:
+            move = chess.Move.from_uci(move_uci)
+            if move not in board.legal_moves:
+                logger.warning(f"Illegal move {move_uci} at position {move_num}")
+                continue
+            board.push(move)
+        except Exception as e:
+            logger.error(f"Error analyzing move {move_num} ({move_uci}): {e}")
+            continue
+        positions.append((move_num, board.fen(), move_uci))
+    return positions
 
-        # Analyze starting position
-        starting_analysis = _analyze_position_with_cache_and_engine(
-            cache, engine, board.fen(), depth, lines
-        )
-        analysis_results.append(
-            {
-                "move_number": 0,
-                "fen": board.fen(),
-                "move_played": None,
-                "analysis": starting_analysis,
-            }
-        )
 
-        # Analyze each move
-        for move_num, move_uci in enumerate(moves, 1):
-            try:
-                move = chess.Move.from_uci(move_uci)
-                if move not in board.legal_moves:
-                    logging.warning(f"Illegal move {move_uci} at position {move_num}")
-                    continue
+def _is_pooled(engine_path):
+    """Whether engine_path is a built-in engine, whose pool games are analysed on."""
+    return engine_path in (engine_path_NNUE, engine_path_HUMAN)
 
-                board.push(move)
 
-                # Analyze the position after the move
-                analysis = _analyze_position_with_cache_and_engine(
-                    cache, engine, board.fen(), depth, lines
-                )
+def _pgn_parallelism(engine_path):
+    """
+    Number of positions of a game analysed at once on the engine pool: half
+    of the pool, leaving the rest to other requests. Below 2 the positions
+    are analysed one at a time instead.
+    """
+    if not _is_pooled(engine_path):
+        return 1
+    return _get_engine_pool(engine_path).pool_size // 2
 
-                analysis_results.append(
-                    {
-                        "move_number": move_num,
-                        "fen": board.fen(),
-                        "move_played": move_uci,
-                        "analysis": analysis,
-                    }
-                )
 
-                logging.info(f"Analyzed move {move_num}/{len(moves)}: {move_uci}")
+def _iter_game_positions(moves, depth, lines, engine_path):
+    logger.info(f"Starting PGN game analysis with depth {depth}, lines {lines}")
 
-            except Exception as e:
-                logging.error(f"Error analyzing move {move_num} ({move_uci}): {e}")
-                continue
+    # Other engines get a dedicated one for the game, started only once a
+    # position is missing from the cache
+    pooled = _is_pooled(engine_path)
+    engine = None
+    executor = None
+    try:
+        positions = _game_positions(moves)
 
-        logging.info(
-            f"PGN analysis complete: {len(analysis_results)} positions analyzed"
+        # Fetch every cached position of the game in one batch
+        cache = get_cache()
+        prefetched = cache.get_cached_batch(
+            [fen for _, fen, _ in positions], depth, lines
         )
-        return analysis_results
+
+        # With a large enough pool, search the missing positions concurrently
+        # on pooled engines; results are still yielded in game order
+        pending = {}
+        workers = _pgn_parallelism(engine_path)
+        if workers > 1:
+            missing = list(
+                dict.fromkeys(fen for _, fen, _ in positions if fen not in prefetched)
+            )
+            if len(missing) > 1:
+                executor = ThreadPoolExecutor(
+                    max_workers=min(workers, len(missing)),
+                    thread_name_prefix="pgn-analysis",
+                )
+                pending = {
+                    fen: executor.submit(call_engine, fen, depth, engine_path, lines)
+                    for fen in missing
+                }
+
+        analyzed = 0
+        for move_num, fen, move_uci in positions:
+            analysis = prefetched.get(fen)
+            if analysis is None:
+                if engine is None and not pooled and fen not in pending:
+                    engine = _start_game_engine(engine_path, lines)
+                try:
+                    if fen in pending:
+                        analysis = pending[fen].result()
+                    elif pooled:
+                        analysis = call_engine(fen, depth, engine_path, lines)
+                    else:
+                        analysis = _analyze_position_with_cache_and_engine(
+                            cache, engine, fen, depth, lines
+                        )
+                except Exception as e:
+                    # Only the starting position is mandatory
+                    if move_num == 0:
+                        raise
+                    logger.error(f"Error analyzing move {move_num} ({move_uci}): {e}")
+                    continue
+
+            if move_num:
+                logger.info("Analyzed move %s/%s: %s", move_num, len(moves), move_uci)
+            analyzed += 1
+            yield {
+                "move_number": move_num,
+                "fen": fen,
+                "move_played": move_uci,
+                "analysis": analysis,
+            }
+
+        logger.info(f"PGN analysis complete: {analyzed} positions analyzed")
 
     except Exception as e:
-        logging.error(f"Error during PGN analysis: {e}")
+        logger.error(f"Error during PGN analysis: {e}")
         raise
     finally:
+        # Drop the searches not started yet if the client went away
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
         # Cleanup dedicated engine
+        if engine:
+            engine.output.close()
         if engine and engine.poll() is None and engine.stdin:
             try:
-                engine.stdin.write("quit\n")
-                engine.stdin.flush()
+                _send(engine, "quit\n")
                 engine.wait(timeout=10)
             except Exception:
                 try:
@@ -495,20 +832,107 @@ def _analyze_position_with_cache_and_engine(cache, engine, fen, depth, lines):
     # Try to get from cache first
     cached_result = cache.get_cached_analysis(fen, depth, lines)
     if cached_result:
-        logging.info(f"Cache hit for position: {fen[:20]}...")
+        logger.info("Cache hit for position: %.20s...", fen)
         return cached_result
 
     # Cache miss - compute analysis with engine
-    logging.info(f"Cache miss - analyzing position: {fen[:20]}...")
+    logger.info("Cache miss - analyzing position: %.20s...", fen)
     result = _analyze_position_with_engine(engine, fen, depth, lines)
 
-    # Store result in cache
-    if result[0]:  # Only cache if we got valid results
+    # Only cache complete searches (see _call_engine_uncached)
+    if result[0] and not engine.searching:
         cache.store_analysis(fen, depth, lines, result[0], result[1])
 
     return result
 
 
+# Keywords ending the principal variation, should an engine print any after it
+_PV_TERMINATORS = frozenset(
+    ("depth", "seldepth", "time", "nodes", "score", "multipv", "wdl")
+)
+
+
+def _parse_info_line(output):
+    """
+    Parse an "info depth ... multipv N ... pv ..." line in a single pass over
+    its tokens. The principal variation is the last field UCI engines print,
+    so parsing stops there.
+
+    Returns:
+        Tuple of (multipv, pv_moves, score, mate, w, d, l, winprob), or None
+        for info lines without a multipv index or principal variation
+    """
+    multipv = None
+    pv_moves = None
+    score = None
+    mate = None
+    winprob = None
+    w = None
+    d = None
+    l = None
+
+    tokens = iter(output.split())
+    for token in tokens:
+        if token == "multipv":
+            multipv = int(next(tokens))
+        elif token == "score":
+            kind = next(tokens)
+            if kind == "cp":
+                score = int(next(tokens))
+            elif kind == "mate":
+                mate = int(next(tokens))
+        elif token == "wdl":
+            w = int(next(tokens))
+            d = int(next(tokens))
+            l = int(next(tokens))
+            winprob = (w + (d / 2)) / 10
+        elif token == "pv":
+            pv_moves = list(tokens)
+            if not _PV_TERMINATORS.isdisjoint(pv_moves):
+                pv_moves = list(
+                    itertools.takewhile(
+                        lambda move: move not in _PV_TERMINATORS, pv_moves
+                    )
+                )
+            break
+
+    if multipv is None or pv_moves is None:
+        return None
+
+    return multipv, pv_moves, score, mate, w, d, l, winprob
+
+
+def _info_multipv(output):
+    """
+    MultiPV index of an info line carrying a principal variation, or None.
+    Much cheaper than _parse_info_line, for the lines that are superseded.
+    """
+    start = output.find(" multipv ")
+    if start < 0 or " pv " not in output:
+        return None
+    start += len(" multipv ")
+    end = output.find(" ", start)
+    return int(output[start:end] if end >= 0 else output[start:])
+
+
+def _move_data(info):
+    """Build the move dict of a line from a tuple returned by _parse_info_line."""
+    _, pv_moves, score, mate, w, d, l, winprob = info
+    # The set of UCI moves is small, so the cached lines share one string
+    # per move instead of holding a copy per occurrence
+    pv_moves = [sys.intern(move) for move in pv_moves]
+    return {
+        "move": pv_moves[0] if pv_moves else None,
+        "pv_moves": pv_moves,
+        "score": score,
+        "mate": mate,
+        "w": w,
+        "d": d,
+        "l": l,
+        "winprob": winprob,
+    }
+
+
 def _analyze_position_with_engine(engine, fen, depth, lines, timeout=30):
     """
     Analyze a specific position with an already initialized engine.
@@ -524,150 +948,145 @@ def _analyze_position_with_engine(engine, fen, depth, lines, timeout=30):
         Tuple of (bestmoves, ponder)
     """
     try:
-        # Set position
-        engine.stdin.write(f"position fen {fen}\n")
-        engine.stdin.flush()
-        engine.stdin.write(f"go depth {depth}\n")
-        engine.stdin.flush()
+        # Set the number of lines and the position and start the search, in
+        # a single write; the engine handles the commands in order
+        engine.searching = True
+        _send(
+            engine,
+            f"setoption name MultiPV value {lines}\n"
+            f"position fen {fen}\n"
+            f"go depth {depth}\n",
+        )
 
-        bestmoves = lines * [None]
+        # Latest info line per MultiPV line. Only these are parsed, once the
+        # search ends; the engine prints far more lines than it keeps
+        latest = lines * [None]
         ponder = None
 
-        start_time = time.perf_counter()
+        deadline = time.monotonic() + timeout
 
         while True:
-            # Check for timeout first
-            if time.perf_counter() - start_time > timeout:
-                logging.warning("Engine analysis timeout")
-                engine.stdin.write("stop\n")
-                engine.stdin.flush()
+            # Sleeps until the engine prints a line or the deadline passes
+            output = engine.output.readline(deadline)
+            if output is None:
+                logger.warning("Engine analysis timeout")
+                _send(engine, "stop\n")
                 break
 
-            # Use non-blocking readline
-            output = engine.stdout.readline().strip()
-            if (
-                isinstance(output, str)
-                and output.startswith("info depth")
-                and "multipv" in output
-            ):
-                parts = output.split()
+            if output.startswith("info depth"):
                 try:
-                    mv_idx = parts.index("multipv") + 1
-                    pv_idx = parts.index("pv") + 1
-
-                    # Extract the full principal variation
-                    pv_moves = []
-                    for i in range(pv_idx, len(parts)):
-                        if parts[i] in [
-                            "depth",
-                            "seldepth",
-                            "time",
-                            "nodes",
-                            "score",
-                            "multipv",
-                            "wdl",
-                        ]:
-                            break
-                        pv_moves.append(parts[i])
-
-                    first_move = pv_moves[0] if pv_moves else None
-
-                    # Get score
-                    score = None
-                    mate = None
-                    if "score" in parts:
-                        score_idx = parts.index("score")
-                        if parts[score_idx + 1] == "cp":
-                            score = int(parts[score_idx + 2])
-                        elif parts[score_idx + 1] == "mate":
-                            mate = int(parts[score_idx + 2])
-
-                    # Extract WDL if available
-                    winprob = None
-                    w = None
-                    d = None
-                    l = None
-                    if "wdl" in parts:
-                        wdl_idx = parts.index("wdl") + 1
-                        w = int(parts[wdl_idx])
-                        d = int(parts[wdl_idx + 1])
-                        l = int(parts[wdl_idx + 2])
-                        winprob = (w + (d / 2)) / 10
-
-                    bestmoves[int(parts[mv_idx]) - 1] = {
-                        "move": first_move,
-                        "pv_moves": pv_moves,
-                        "score": score,
-                        "mate": mate,
-                        "w": w,
-                        "d": d,
-                        "l": l,
-                        "winprob": winprob,
-                    }
-
+                    multipv = _info_multipv(output)
+                    if multipv is not None:
+                        latest[multipv - 1] = output
                 except Exception as e:
-                    logging.error(f"Parse error in position analysis: {e}")
+                    logger.error(f"Parse error in position analysis: {e}")
                     continue
 
             elif output.startswith("bestmove"):
+                engine.searching = False
                 parts = output.split()
                 if len(parts) >= 4:
                     ponder = parts[3]
                 break
 
-        # Clean None entries from bestmoves
-        clean_bestmoves = [move for move in bestmoves if move is not None]
-        return clean_bestmoves, ponder
+        # Skip the lines the engine never reported
+        bestmoves = []
+        for output in latest:
+            if output is None:
+                continue
+            try:
+                info = _parse_info_line(output)
+            except Exception as e:
+                logger.error(f"Parse error in position analysis: {e}")
+                continue
+            if info is not None:
+                bestmoves.append(_move_data(info))
+        return bestmoves, ponder
 
     except Exception as e:
-        engine.stdin.write("stop\n")
-        engine.stdin.flush()
-        logging.error(f"Error analyzing position {fen}: {e}")
+        _send(engine, "stop\n")
+        logger.error(f"Error analyzing position {fen}: {e}")
         return [], None
 
 
-def apply_move_to_fen(fen, move_uci):
-    """
-    Uses python-chess to apply a UCI move string to a FEN.
-    Handles promotions, castling, en passant, clock updates.
-    """
-    board = chess.Board(fen)
+def _fen_after_move(board, move_uci):
+    """FEN after playing move_uci on board; board itself is left unchanged."""
     move = chess.Move.from_uci(move_uci)
 
-    if move not in board.legal_moves:
+    if not board.is_legal(move):
         raise ValueError(f"Illegal move '{move_uci}' for given FEN")
 
     board.push(move)
-    return board.fen()
+    try:
+        return board.fen()
+    finally:
+        board.pop()
 
 
-# Evaluate specific move from a FEN
-def eval_move(fen, move, depth, engine_path):
+def _eval_position(new_fen, move, depth, engine_path):
+    """Best line of new_fen, the position reached by move, or None."""
     try:
-        new_fen = apply_move_to_fen(fen, move)
         evals, _ = call_engine(new_fen, depth, engine_path, lines=1)
         return evals[0] if evals else None
     except Exception as e:
-        print(f"Error evaluating move {move}: {e}")
+        logger.error("Error evaluating move %s: %s", move, e)
         return None
 
 
+def _submit_eval(executor, board, move, depth, engine_path):
+    """
+    Evaluate move on executor, reusing the already parsed board of the
+    position. The FEN after the move is computed in the calling thread, as
+    board is not safe to share. Returns a Future, or None if move is missing
+    or cannot be played.
+    """
+    if not move:
+        return None
+    try:
+        new_fen = _fen_after_move(board, move)
+    except Exception as e:
+        logger.error("Error evaluating move %s: %s", move, e)
+        return None
+    return executor.submit(_eval_position, new_fen, move, depth, engine_path)
+
+
 # Master function
 def engines(fen, depth):
-    bestmovesNNUE, ponderNNUE = call_engine(fen, depth, engine_path_NNUE, lines=3)
-    bestmovesHUMAN, ponderHUMAN = call_engine(fen, depth, engine_path_HUMAN, lines=3)
+    # The two analyses, and then the four cross-evaluations, are independent
+    # searches on separate engines, so each group runs concurrently
+    executor = _get_engine_executor()
+    f_nnue = executor.submit(call_engine, fen, depth, engine_path_NNUE, 3)
+    f_human = executor.submit(call_engine, fen, depth, engine_path_HUMAN, 3)
+    bestmovesNNUE, ponderNNUE = f_nnue.result()
+    bestmovesHUMAN, ponderHUMAN = f_human.result()
+
+    # Parsed once for the four moves evaluated below
+    board = chess.Board(fen)
 
     human_move = bestmovesHUMAN[0]["move"]
-    nnue_eval_of_human = eval_move(fen, human_move, depth, engine_path_NNUE)
+    f_nnue_eval_of_human = _submit_eval(
+        executor, board, human_move, depth, engine_path_NNUE
+    )
 
     nnue_move = bestmovesNNUE[0]["move"]
-    human_eval_of_nnue = eval_move(fen, nnue_move, depth, engine_path_HUMAN)
+    f_human_eval_of_nnue = _submit_eval(
+        executor, board, nnue_move, depth, engine_path_HUMAN
+    )
+
+    f_nnue_eval_of_human_ponder = _submit_eval(
+        executor, board, ponderHUMAN, depth, engine_path_NNUE
+    )
+    f_human_eval_of_nnue_ponder = _submit_eval(
+        executor, board, ponderNNUE, depth, engine_path_HUMAN
+    )
 
+    nnue_eval_of_human = f_nnue_eval_of_human.result() if f_nnue_eval_of_human else None
+    human_eval_of_nnue = f_human_eval_of_nnue.result() if f_human_eval_of_nnue else None
     nnue_eval_of_human_ponder = (
-        eval_move(fen, ponderHUMAN, depth, engine_path_NNUE) if ponderHUMAN else None
+        f_nnue_eval_of_human_ponder.result() if f_nnue_eval_of_human_ponder else None
     )
     human_eval_of_nnue_ponder = (
-        eval_move(fen, ponderNNUE, depth, engine_path_HUMAN) if ponderNNUE else None
+        f_human_eval_of_nnue_ponder.result() if f_human_eval_of_nnue_ponder else None
     )
 
     return {
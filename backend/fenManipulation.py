@@ -15,6 +15,8 @@
 #along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import functools
+import logging
 import string
 
 # Helper function, not my code
@@ -43,6 +45,8 @@ def __fen_to_piece_names(fen):
     return ", ".join(output) + "\n"
 
 # Main fuction, to be called outside
+# Cached per FEN: follow-up questions keep asking about the same position
+@functools.lru_cache(maxsize=4096)
 def fen_explainer(fen) -> str:
     description = []
 
@@ -84,5 +88,5 @@ def fen_explainer(fen) -> str:
     else:
         description.append(f"There is an en-passant capture on square {firstsplit[3]}.")
     explainedFEN = "\n\n".join(description)
-    print("[INFO] side:", side)
+    logging.debug("side: %s", side)
     return explainedFEN, side
\ No newline at end of file
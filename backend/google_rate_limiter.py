@@ -14,15 +14,36 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import atexit
 import json
 import os
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
 import logging as log
 
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not locked across processes
+    fcntl = None
+
+
+# Calls counted in memory before the usage file is rewritten
+_SAVE_EVERY_CALLS = 10
+# How often the current month is checked for a rollover
+_MONTH_CHECK_SECONDS = 60
+
 
 class GoogleRateLimiter:
-    """Simple file-based rate limiter for Google AI API calls."""
+    """
+    Simple file-based rate limiter for Google AI API calls. The usage is
+    kept in memory and merged into the file every few calls and on exit, so
+    processes sharing the file share the quota; each one sees the calls of
+    the others at its next save. Up to _SAVE_EVERY_CALLS - 1 calls are lost
+    if a process is killed before saving.
+    """
 
     def __init__(self, max_monthly_calls=None):
         """
@@ -32,10 +53,16 @@ class GoogleRateLimiter:
             max_monthly_calls: Maximum number of calls per month. If None, reads from env.
         """
         self.storage_file = Path(__file__).parent / "google_api_usage.json"
+        self.lock_file = self.storage_file.with_suffix(".json.lock")
         self.max_monthly_calls = max_monthly_calls or int(
             os.environ.get("GOOGLE_AI_MAX_MONTHLY_CALLS", "100")
         )
+        self._lock = threading.Lock()
+        self._unsaved_calls = 0
+        self._saved_usage = None  # (month, count) last read or written
+        self._month_checked_at = time.monotonic()
         self._load_usage()
+        atexit.register(self.flush)
 
     def _load_usage(self):
         """Load usage data from file."""
@@ -45,6 +72,7 @@ class GoogleRateLimiter:
                     data = json.load(f)
                     self.current_month = data.get("month")
                     self.call_count = data.get("count", 0)
+                    self._saved_usage = (self.current_month, self.call_count)
             except (json.JSONDecodeError, IOError) as e:
                 log.warning(f"Failed to load Google API usage data: {e}")
                 self._reset_usage()
@@ -56,19 +84,91 @@ class GoogleRateLimiter:
         if self.current_month != now_month:
             self._reset_usage()
 
+    def _check_month(self):
+        """Reset the usage if a new month started; checked once a minute."""
+        now = time.monotonic()
+        if now - self._month_checked_at < _MONTH_CHECK_SECONDS:
+            return
+        self._month_checked_at = now
+        if self.current_month != datetime.now().strftime("%Y-%m"):
+            self._reset_usage()
+
     def _reset_usage(self):
         """Reset usage counter for the current month."""
+        if self._unsaved_calls:
+            # Count the pending calls towards the month they were made in
+            self._save_usage()
         self.current_month = datetime.now().strftime("%Y-%m")
         self.call_count = 0
+        self._unsaved_calls = 0
         self._save_usage()
 
+    @contextmanager
+    def _file_lock(self):
+        """Hold an exclusive lock on the usage file across processes."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_file, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_saved_usage(self):
+        """Return the (month, count) currently in the usage file."""
+        try:
+            with open(self.storage_file, "r") as f:
+                data = json.load(f)
+            return data.get("month"), data.get("count", 0)
+        except FileNotFoundError:
+            return None, 0
+        except (json.JSONDecodeError, IOError) as e:
+            log.warning(f"Failed to read Google API usage data: {e}")
+            return None, 0
+
     def _save_usage(self):
-        """Save usage data to file."""
+        """
+        Merge the calls counted since the last save into the usage file. The
+        file is re-read under a lock, so processes add up their calls instead
+        of overwriting each other, and written to a temporary file first and
+        then swapped in, so a crash mid-write never leaves a truncated file.
+        """
+        if not self._unsaved_calls and self._saved_usage == (
+            self.current_month,
+            self.call_count,
+        ):
+            return
+        tmp_file = self.storage_file.with_suffix(f".json.{os.getpid()}.tmp")
         try:
-            with open(self.storage_file, "w") as f:
-                json.dump({"month": self.current_month, "count": self.call_count}, f)
-        except IOError as e:
+            with self._file_lock():
+                month, count = self._read_saved_usage()
+                if month is not None and month > self.current_month:
+                    # Another process already rolled over to a new month
+                    usage = (month, count)
+                elif month == self.current_month:
+                    usage = (month, count + self._unsaved_calls)
+                else:
+                    usage = (self.current_month, self._unsaved_calls)
+                if usage != (month, count):
+                    with open(tmp_file, "w") as f:
+                        json.dump({"month": usage[0], "count": usage[1]}, f)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp_file, self.storage_file)
+        except OSError as e:
             log.error(f"Failed to save Google API usage data: {e}")
+        else:
+            self.current_month, self.call_count = usage
+            self._saved_usage = usage
+            self._unsaved_calls = 0
+
+    def flush(self):
+        """Write the calls counted since the last save to the usage file."""
+        with self._lock:
+            if self._unsaved_calls:
+                self._save_usage()
 
     def can_make_call(self):
         """
@@ -77,17 +177,32 @@ class GoogleRateLimiter:
         Returns:
             bool: True if call is allowed, False otherwise
         """
-        self._load_usage()  # Reload to check for month change
+        with self._lock:
+            self._check_month()
+            call_count = self.call_count
         log.info(
-            f"Google API usage for {self.current_month}: {self.call_count}/{self.max_monthly_calls}"
+            f"Google API usage for {self.current_month}: {call_count}/{self.max_monthly_calls}"
         )
-        return self.call_count < self.max_monthly_calls
+        return call_count < self.max_monthly_calls
+
+    def acquire_or_raise(self):
+        """
+        Check the monthly limit before a call.
+
+        Raises:
+            RateLimitExceeded: If the monthly limit has been reached.
+        """
+        if not self.can_make_call():
+            raise RateLimitExceeded(self.get_usage_stats())
 
     def increment_call(self):
         """Increment the call counter."""
-        self._load_usage()  # Reload to ensure we have latest data
-        self.call_count += 1
-        self._save_usage()
+        with self._lock:
+            self._check_month()
+            self.call_count += 1
+            self._unsaved_calls += 1
+            if self._unsaved_calls >= _SAVE_EVERY_CALLS:
+                self._save_usage()
 
     def get_usage_stats(self):
         """
@@ -96,13 +211,14 @@ class GoogleRateLimiter:
         Returns:
             dict: Dictionary with usage information
         """
-        self._load_usage()
-        return {
-            "month": self.current_month,
-            "calls_used": self.call_count,
-            "calls_remaining": max(0, self.max_monthly_calls - self.call_count),
-            "max_calls": self.max_monthly_calls,
-        }
+        with self._lock:
+            self._check_month()
+            return {
+                "month": self.current_month,
+                "calls_used": self.call_count,
+                "calls_remaining": max(0, self.max_monthly_calls - self.call_count),
+                "max_calls": self.max_monthly_calls,
+            }
 
 
 class RateLimitExceeded(Exception):
@@ -0,0 +1,108 @@
+# This file is part of ShashGuru, a chess analyzer that takes a FEN, asks a UCI chess engine to analyse it and then outputs a natural language analysis made by an LLM.
+# Copyright (C) 2025  Alessandro Libralesso
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import threading
+import time
+import logging as log
+
+
+class TokenBucket:
+    """Thread-safe in-process token bucket, used to pace calls to a provider."""
+
+    def __init__(self, capacity, refill_rate, name="provider"):
+        """
+        Initialize the bucket (starts full).
+
+        Args:
+            capacity: Maximum number of tokens (burst size).
+            refill_rate: Tokens added per second.
+            name: Provider name, used in logs and error messages.
+        """
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.name = name
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate
+        )
+        self.last_refill = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Take tokens if available.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the seconds to wait
+            before enough tokens are available.
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0.0
+            return (tokens - self.tokens) / self.refill_rate
+
+    def acquire_or_raise(self, tokens=1, max_wait=5.0):
+        """
+        Take tokens, waiting up to max_wait seconds for a refill.
+
+        Raises:
+            TokenBucketExhausted: If the tokens are not available within max_wait.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            if time.monotonic() + wait > deadline:
+                log.warning(f"{self.name} rate limit reached, retry in {wait:.1f}s")
+                raise TokenBucketExhausted(self.name, wait)
+            time.sleep(wait)
+
+    async def aacquire_or_raise(self, tokens=1, max_wait=5.0):
+        """
+        Async variant of acquire_or_raise, waiting with asyncio.sleep so the
+        event loop keeps running other coroutines meanwhile.
+
+        Raises:
+            TokenBucketExhausted: If the tokens are not available within max_wait.
+        """
+        deadline = time.monotonic() + max_wait
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0.0:
+                return
+            if time.monotonic() + wait > deadline:
+                log.warning(f"{self.name} rate limit reached, retry in {wait:.1f}s")
+                raise TokenBucketExhausted(self.name, wait)
+            await asyncio.sleep(wait)
+
+
+class TokenBucketExhausted(Exception):
+    """Exception raised when a provider's token bucket is empty."""
+
+    def __init__(self, provider, retry_after):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(
+            f"{provider} rate limit reached. Retry in {retry_after:.1f} seconds."
+        )
@@ -10,13 +10,6 @@ import LLMHandler
 
 
 def query_LLM(prompt, model, chat_history=None, max_history=10):
-
-    pipe = lambda messages, max_new_tokens: model.chat.completions.create(
-        model = "meta-llama/Llama-3.1-8B-Instruct",
-        messages=messages,
-        stream=True,
-        max_completion_tokens=max_new_tokens,
-    )
     if chat_history is None:
         chat_history = []
     chat_history = chat_history[-max_history:]
@@ -32,14 +25,24 @@ def query_LLM(prompt, model, chat_history=None, max_history=10):
         {"role": "user", "content": prompt}
     ]
 
-    output = pipe(messages, max_new_tokens=1024)
-    analysis = ""
+    output = model.chat.completions.create(
+        model="meta-llama/Llama-3.1-8B-Instruct",
+        messages=messages,
+        stream=True,
+        max_completion_tokens=1024,
+    )
+    parts = []
     for out in output:
-        if out.choices[0].finish_reason is not None:
+        if not out.choices:
+            continue
+        choice = out.choices[0]
+        delta = choice.delta.content
+        if delta:
+            print(delta, end="", flush=True)
+            parts.append(delta)
+        if choice.finish_reason is not None:
             break
-        delta = out.choices[0].delta.content
-        print(delta, end="", flush=True)
-        analysis += delta
+    analysis = "".join(parts)
 
     chat_history.append({"role": "user", "content": prompt})
     chat_history.append({"role": "assistant", "content": analysis})